@@ -0,0 +1,307 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from codec import ZlibCodec
+from routing_table import RoutingTable
+from utils import get_host_port
+from config import (
+    BOOTSTRAP_NODE,
+    BULK_BATCH_SIZE,
+    BULK_CHUNK_SIZE,
+    BULK_CONCURRENCY,
+    BULK_MAX_RETRIES
+)
+
+
+def parse_record(line: bytes, fmt: str):
+    """
+    Parses one input line into a {"key", "value"[, "ttl"]} item, or None for blank
+    lines and CSV headers.
+    """
+    text = line.decode("utf-8").rstrip("\r\n")
+    if not text.strip():
+        return None
+    if fmt == "jsonl":
+        record = json.loads(text)
+        value = record["value"]
+        # Values are stored as strings; keep non-string JSON as JSON, not as a Python repr
+        item = {"key": str(record["key"]), "value": value if isinstance(value, str) else json.dumps(value)}
+        ttl = record.get("ttl")
+    else:
+        row = next(csv.reader([text]))
+        if row[:2] == ["key", "value"]:
+            return None
+        item = {"key": row[0], "value": row[1]}
+        ttl = row[2] if len(row) > 2 and row[2] else None
+    if ttl is not None:
+        item["ttl"] = float(ttl)
+    return item
+
+
+def read_chunks(path: str, fmt: str, offset: int = 0, chunk_size: int = BULK_CHUNK_SIZE):
+    """
+    Streams the input file from a byte offset, yielding (items, end_offset) for
+    every chunk_size records. One record per line.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        items = []
+        for line in f:
+            offset += len(line)
+            item = parse_record(line, fmt)
+            if item is not None:
+                items.append(item)
+            if len(items) >= chunk_size:
+                yield items, offset
+                items = []
+        if items:
+            yield items, offset
+
+
+class Checkpoint:
+    """
+    Resumable progress for one input file. Chunks may finish out of order; only
+    the contiguous prefix of finished chunks is persisted, so resuming never
+    skips an unacknowledged record. Progress is tied to the input's path, size,
+    mtime and inode, so a file edited or replaced in place is loaded from the
+    start, and the checkpoint is removed once a load completes.
+    """
+    def __init__(self, path: str, input_path: str) -> None:
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.identity = _file_identity(self.input_path)
+        self.offset = 0
+        self.records = 0
+        self.finished = {}  # chunk id -> (end offset, records), waiting on earlier chunks
+        self.next_chunk = 0
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get("input") == self.input_path and saved.get("file") == self.identity:
+                self.offset = saved["offset"]
+                self.records = saved["records"]
+            elif saved.get("input") == self.input_path:
+                print(f"[Bulk] {input_path} changed since {path} was written; starting from the beginning")
+
+    def complete(self, chunk_id: int, end_offset: int, records: int) -> None:
+        with self.lock:
+            self.finished[chunk_id] = (end_offset, records)
+            advanced = False
+            while self.next_chunk in self.finished:
+                end_offset, records = self.finished.pop(self.next_chunk)
+                self.offset = end_offset
+                self.records += records
+                self.next_chunk += 1
+                advanced = True
+            if advanced:
+                self._save()
+
+    def finish(self) -> None:
+        """
+        Removes the checkpoint after the whole file is loaded, so the next run
+        of the same command loads it again instead of resuming at its end.
+        """
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"input": self.input_path, "file": self.identity,
+                       "offset": self.offset, "records": self.records}, f)
+        os.replace(tmp, self.path)
+
+
+def _file_identity(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+
+
+class BulkLoader:
+    """
+    Loads a large JSONL/CSV file into the cluster. Records are read in chunks,
+    partitioned by ring owner, and sent as /kv/batch requests with at most
+    `concurrency` requests in flight per node.
+    """
+    def __init__(self, bootstrap=BOOTSTRAP_NODE, batch_size=BULK_BATCH_SIZE,
+                 chunk_size=BULK_CHUNK_SIZE, concurrency=BULK_CONCURRENCY):
+        self.bootstrap = bootstrap
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.codec = ZlibCodec()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.node_slots = {}   # node_id -> semaphore bounding in-flight batches
+        self.node_counts = {}  # node_id -> records stored
+        self.bytes_sent = 0
+        self.error = None
+        self.routing_table = None
+        self.refresh()
+
+    def refresh(self, node_id=None):
+        host, port = get_host_port(node_id or self.bootstrap)
+        resp = requests.get(f"http://{host}:{port}/routing_table", timeout=5)
+        remote_rt = resp.json()
+        with self.lock:
+            if self.routing_table is None or remote_rt["version"] > self.routing_table.version:
+                table = RoutingTable(self_host="client", self_port=0)
+                table.replace_with(remote_rt)
+                self.routing_table = table
+
+    def _session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _slots(self, node_id):
+        with self.lock:
+            if node_id not in self.node_slots:
+                self.node_slots[node_id] = threading.Semaphore(self.concurrency)
+            return self.node_slots[node_id]
+
+    def _partition(self, items):
+        """
+        Splits items into per-node batches of at most batch_size.
+        """
+        table = self.routing_table
+        groups = table.partition([item["key"] for item in items])
+        batches = []
+        for node_id, idxs in groups.items():
+            for i in range(0, len(idxs), self.batch_size):
+                batches.append((node_id, [items[j] for j in idxs[i:i + self.batch_size]]))
+        return batches
+
+    def _send_batch(self, node_id, items, reroutes=0):
+        """
+        Sends one batch, re-routing any keys the node rejects because the ring moved.
+        """
+        for attempt in range(BULK_MAX_RETRIES):
+            try:
+                with self._slots(node_id):
+                    body, headers = self.codec.encode_json(node_id, {"items": items})
+                    headers["Routing-Version"] = str(self.routing_table.version)
+                    resp = self._session().put(f"http://{node_id}/kv/batch", data=body, headers=headers, timeout=30)
+                self.codec.note_peer(node_id, resp.headers)
+                resp.raise_for_status()
+                result = resp.json()
+                break
+            except requests.RequestException as e:
+                if attempt == BULK_MAX_RETRIES - 1:
+                    raise
+                print(f"[Bulk] Batch to {node_id} failed ({e}), retrying")
+                time.sleep(2 ** attempt)
+
+        with self.lock:
+            self.bytes_sent += len(body)
+            self.node_counts[node_id] = self.node_counts.get(node_id, 0) + result["stored"]
+        rejected = set(result["rejected"])
+        if not rejected:
+            return
+        if reroutes == BULK_MAX_RETRIES:
+            raise RuntimeError(f"{len(rejected)} keys still rejected by {node_id} after refreshing the ring")
+        # Ring changed under us: pick up the new table and re-partition the leftovers
+        self.refresh(node_id)
+        leftovers = [item for item in items if item["key"] in rejected]
+        for target, batch in self._partition(leftovers):
+            self._send_batch(target, batch, reroutes + 1)
+
+    def load(self, path, fmt="jsonl", checkpoint_path=None):
+        """
+        Loads the file, resuming from checkpoint_path if it records earlier progress,
+        and returns a throughput report.
+        """
+        checkpoint = Checkpoint(checkpoint_path, path)
+        if checkpoint.records:
+            print(f"[Bulk] Resuming after {checkpoint.records} records (byte {checkpoint.offset})")
+        resumed = checkpoint.records
+        start = time.time()
+        nodes = max(1, len(self.routing_table.node_map))
+        # Two chunks in memory: one being sent while the next is read and partitioned
+        inflight = threading.Semaphore(2)
+
+        with ThreadPoolExecutor(max_workers=nodes * self.concurrency) as pool:
+            for chunk_id, (items, end_offset) in enumerate(read_chunks(path, fmt, checkpoint.offset, self.chunk_size)):
+                inflight.acquire()
+                if self.error:
+                    break
+                batches = self._partition(items)
+                state = {"remaining": len(batches), "failed": False}
+
+                def done(future, chunk_id=chunk_id, end_offset=end_offset, count=len(items), state=state):
+                    with self.lock:
+                        if future.exception():
+                            state["failed"] = True
+                            if self.error is None:
+                                self.error = future.exception()
+                        state["remaining"] -= 1
+                        finished = state["remaining"] == 0
+                    if finished:
+                        if not state["failed"]:
+                            checkpoint.complete(chunk_id, end_offset, count)
+                            elapsed = time.time() - start
+                            loaded = checkpoint.records - resumed
+                            print(f"[Bulk] {checkpoint.records} records committed ({loaded / max(elapsed, 1e-9):.0f} rec/s)")
+                        inflight.release()
+
+                for node_id, batch in batches:
+                    pool.submit(self._send_batch, node_id, batch).add_done_callback(done)
+
+        if self.error:
+            raise self.error
+        checkpoint.finish()
+
+        elapsed = time.time() - start
+        loaded = checkpoint.records - resumed
+        return {
+            "records": loaded,
+            "total_records": checkpoint.records,
+            "seconds": round(elapsed, 2),
+            "records_per_second": round(loaded / elapsed, 1) if elapsed else 0.0,
+            "megabytes_sent": round(self.bytes_sent / 2 ** 20, 2),
+            "per_node": dict(self.node_counts),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load a JSONL or CSV file into the cluster.")
+    parser.add_argument("path", help="input file, one record per line")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="input format (default: from file extension)")
+    parser.add_argument("--bootstrap", default=BOOTSTRAP_NODE, help="node to fetch the routing table from")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY, help="in-flight batches per node")
+    parser.add_argument("--checkpoint", help="progress file for resuming (default: <path>.checkpoint)")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+    checkpoint = args.checkpoint or f"{args.path}.checkpoint"
+    try:
+        loader = BulkLoader(args.bootstrap, args.batch_size, args.chunk_size, args.concurrency)
+        report = loader.load(args.path, fmt, checkpoint)
+    except Exception as e:
+        print(f"[Bulk] Load aborted: {e}. Re-run the same command to resume from {checkpoint}.")
+        sys.exit(1)
+
+    print("[Bulk] Done.")
+    print(f"  records loaded : {report['records']} ({report['total_records']} total)")
+    print(f"  elapsed        : {report['seconds']}s")
+    print(f"  throughput     : {report['records_per_second']} records/s, {report['megabytes_sent']} MB sent")
+    for node_id, count in sorted(report["per_node"].items()):
+        print(f"  {node_id:<22} {count}")
+
+
+if __name__ == "__main__":
+    main()
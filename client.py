@@ -1,55 +1,227 @@
 import requests
 import random
 import sys
-from config import BOOTSTRAP_NODE
+import heapq
+import json
+import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import BOOTSTRAP_NODE, SCAN_PAGE_SIZE, STREAM_CHUNK_SIZE, WATCH_TIMEOUT
 from routing_table import RoutingTable
+from codec import ZlibCodec
 from utils import hash_str, get_host_port
 class SmartClient:
-    def __init__(self):
+    def __init__(self, watch=True):
         self.routing_table = None
         self.version = -1
+        self.codec = ZlibCodec()
+        self.lock = threading.Lock()
+        self.watching = False
+        self.hot_replicas = {}  # hot key -> node ids holding read replicas of it
         self.bootstrap_host, self.bootstrap_port = get_host_port(BOOTSTRAP_NODE)
         self.bootstrap_join()
+        if watch:
+            self.start_watch()
 
     def bootstrap_join(self):
         try:
             url = f"http://{self.bootstrap_host}:{self.bootstrap_port}/routing_table"
             resp = requests.get(url, timeout=2)
-            remote_rt = resp.json()
-            self.version = remote_rt.get("version", -1)
-            if self.routing_table is None:
-                self.routing_table = RoutingTable(self_host="client", self_port=0)
-
-            self.routing_table.replace_with(remote_rt)
+            self._apply_routing_table(resp.json(), force=True)
             print(f"[Info] Routing table loaded. Version: {self.version}")
 
         except Exception as e:
             print(f"[Error] Failed to load routing table from bootstrap: {e}")
             sys.exit(1)
 
-    def put(self, key, value):
-        responsible_node = self.routing_table.get_responsible_node(key)
-        url = f"http://{responsible_node.host}:{responsible_node.port}/kv"
-        headers = {"Routing-Version": str(self.version)}
+    def refresh(self, node=None):
+        """
+        Fetches the routing table from the given node (default: bootstrap) and
+        adopts it if it is newer than ours.
+        """
+        host, port = (node.host, node.port) if node else (self.bootstrap_host, self.bootstrap_port)
+        resp = requests.get(f"http://{host}:{port}/routing_table", timeout=2)
+        self._apply_routing_table(resp.json())
+
+    def start_watch(self):
+        """
+        Subscribes to ring changes with a background long-poll on /routing_table/watch.
+        """
+        self.watching = True
+        threading.Thread(target=self._watch_loop, daemon=True).start()
+
+    def _watch_loop(self):
+        target = None
+        while self.watching:
+            # Re-pick once the watched node has left the ring: it would keep answering with a frozen ring
+            if target is None or target.node_id not in self.routing_table.node_map:
+                nodes = list(self.routing_table.node_map.values())
+                target = random.choice(nodes) if nodes else None
+            host, port = (target.host, target.port) if target else (self.bootstrap_host, self.bootstrap_port)
+            try:
+                resp = requests.get(
+                    f"http://{host}:{port}/routing_table/watch",
+                    params={"since": self.version, "timeout": WATCH_TIMEOUT},
+                    timeout=WATCH_TIMEOUT + 5
+                )
+                self._apply_routing_table(resp.json())
+            except Exception:
+                # Watched node is gone; pick another one from the ring
+                target = None
+                time.sleep(1)
+
+    def put(self, key, value, ttl=None):
+        payload = {"key": key, "value": value}
+        if ttl is not None:
+            payload["ttl"] = ttl
+
+        def send(node, headers):
+            url = f"http://{node.host}:{node.port}/kv"
+            body, body_headers = self.codec.encode_json(node.node_id, payload)
+            resp = requests.put(url, data=body, headers={**headers, **body_headers})
+            self.codec.note_peer(node.node_id, resp.headers)
+            return resp
+
         try:
-            resp = requests.put(url, json={"key": key, "value": value}, headers=headers)
-            result = resp.json()
+            result = self._send_with_retry(key, send)
+            self.hot_replicas.pop(key, None)
             print(f"[PUT Success] {result}")
-            self._check_routing_update(result)
+            return result
         except Exception as e:
             print(f"[PUT Error] {e}")
 
     def get(self, key):
+        def send(node, headers):
+            replicas = self.hot_replicas.get(key)
+            if replicas:
+                # Spread reads of a hot key over its owner and replicas
+                choice = random.choice([node.node_id] + replicas)
+                if choice != node.node_id:
+                    try:
+                        resp = requests.get(f"http://{choice}/kv", params={"key": key}, headers=headers, timeout=2)
+                        if resp.status_code == 200:
+                            return resp
+                    except requests.RequestException as e:
+                        print(f"[Info] Replica {choice} unreachable ({e}), reading from the owner")
+                    # Replica is down, was invalidated or its lease ran out; fall back to the owner
+                    self.hot_replicas.pop(key, None)
+            url = f"http://{node.host}:{node.port}/kv"
+            return requests.get(url, params={"key": key}, headers=headers)
+
+        try:
+            result = self._send_with_retry(key, send)
+            if "replicas" in result:
+                self.hot_replicas[key] = result["replicas"]
+            elif not result.get("replica"):
+                self.hot_replicas.pop(key, None)
+            print(f"[GET Success] {result}")
+            return result
+        except Exception as e:
+            print(f"[GET Error] {e}")
+
+    def _send_with_retry(self, key, send):
+        """
+        Sends a request to the owner of key. If that node says it is no longer
+        responsible, the ring is refreshed from it and the request retried once.
+        """
+        for attempt in range(2):
+            responsible_node = self.routing_table.get_responsible_node(key)
+            resp = send(responsible_node, {"Routing-Version": str(self.version)})
+            if resp.status_code == 403 and attempt == 0:
+                print(f"[Info] {responsible_node.node_id} is not responsible for '{key}', refreshing routing table")
+                self.refresh(responsible_node)
+                continue
+            result = resp.json()
+            self._check_routing_update(result)
+            return result
+
+    def put_stream(self, key, data, ttl=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Uploads a large value as raw bytes. `data` may be a bytes-like object, a
+        binary file object, or an iterable of byte chunks; it is sent with chunked
+        transfer encoding and never assembled in memory here.
+        """
         responsible_node = self.routing_table.get_responsible_node(key)
-        url = f"http://{responsible_node.host}:{responsible_node.port}/kv"
+        url = f"http://{responsible_node.host}:{responsible_node.port}/kv/stream"
         headers = {"Routing-Version": str(self.version)}
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            view = memoryview(data)
+            data = (view[i:i + chunk_size] for i in range(0, len(view), chunk_size))
+        elif hasattr(data, "read"):
+            reader = data
+            data = iter(lambda: reader.read(chunk_size), b"")
         try:
-            resp = requests.get(url, params={"key": key}, headers=headers)
+            params = {"key": key} if ttl is None else {"key": key, "ttl": ttl}
+            resp = requests.put(url, params=params, data=data, headers=headers)
             result = resp.json()
-            print(f"[GET Success] {result}")
+            print(f"[PUT Success] {result}")
             self._check_routing_update(result)
+            return result
         except Exception as e:
-            print(f"[GET Error] {e}")
+            print(f"[PUT Error] {e}")
+
+    def get_stream(self, key, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Yields a stored value as raw byte chunks without buffering it whole.
+        """
+        responsible_node = self.routing_table.get_responsible_node(key)
+        url = f"http://{responsible_node.host}:{responsible_node.port}/kv/stream"
+        with requests.get(url, params={"key": key}, stream=True) as resp:
+            resp.raise_for_status()
+            yield from resp.iter_content(chunk_size=chunk_size)
+
+    def scan(self, prefix="", page_size=SCAN_PAGE_SIZE):
+        """
+        Yields (key, value) pairs from every node in key order. The first page of
+        each node is requested in parallel, and the next page of a node is prefetched
+        while the current one is consumed, so at most two pages per node are held.
+        """
+        nodes = list(self.routing_table.node_map.values())
+        if not nodes:
+            return
+        with ThreadPoolExecutor(max_workers=len(nodes)) as pool:
+            streams = []
+            for node in nodes:
+                first = pool.submit(self._fetch_scan_page, node, prefix, None, page_size)
+                streams.append(self._scan_node(pool, node, prefix, page_size, first))
+
+            last_key = None
+            for key, value in heapq.merge(*streams, key=lambda kv: kv[0]):
+                # A key caught mid-migration can briefly live on two nodes
+                if key == last_key:
+                    continue
+                last_key = key
+                yield key, value
+
+    def _scan_node(self, pool, node, prefix, page_size, future):
+        while future is not None:
+            items, cursor = future.result()
+            future = None
+            if cursor:
+                future = pool.submit(self._fetch_scan_page, node, prefix, cursor, page_size)
+            yield from items
+
+    def _fetch_scan_page(self, node, prefix, cursor, page_size):
+        url = f"http://{node.host}:{node.port}/scan"
+        params = {"prefix": prefix, "limit": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        items, next_cursor = [], None
+        with requests.get(url, params=params, stream=True, timeout=10) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                record = json.loads(line)
+                if "key" in record:
+                    value = record["value"]
+                    if record.get("encoding") == "base64":
+                        value = base64.b64decode(value)
+                    items.append((record["key"], value))
+                else:
+                    next_cursor = record.get("cursor")
+        return items, next_cursor
 
     def show_ring(self):
         nodes = self.routing_table.node_map.values()
@@ -68,10 +240,23 @@ class SmartClient:
     def _check_routing_update(self, result):
         rt = result.get("routing_table")
         if rt:
-            remote_version = rt.get("version", -1)
-            if remote_version > self.version:
-                self.routing_table.replace_with(rt)
-                print(f"[Info] Routing table updated to version {self.version}.")
+            self._apply_routing_table(rt)
+
+    def _apply_routing_table(self, rt, force=False):
+        """
+        Adopts a remote routing table if it is newer. The new ring is built off to
+        the side and swapped in, so concurrent lookups never see a half-built table.
+        """
+        remote_version = rt.get("version", -1)
+        with self.lock:
+            if not force and remote_version <= self.version:
+                return
+            table = RoutingTable(self_host="client", self_port=0)
+            table.replace_with(rt)
+            self.routing_table = table
+            self.version = remote_version
+        if not force:
+            print(f"[Info] Routing table updated to version {self.version}.")
 
 def main():
     client = SmartClient()
@@ -88,9 +273,46 @@ def main():
                 key = parts[1]
                 value = " ".join(parts[2:])
                 client.put(key, value)
+            elif action == "putex" and len(parts) >= 4:
+                key = parts[1]
+                try:
+                    ttl = float(parts[2])
+                except ValueError:
+                    print("[PUT Error] TTL must be a number of seconds")
+                    continue
+                value = " ".join(parts[3:])
+                client.put(key, value, ttl=ttl)
             elif action == "get" and len(parts) == 2:
                 key = parts[1]
                 client.get(key)
+            elif action == "upload" and len(parts) == 3:
+                key, path = parts[1], parts[2]
+                try:
+                    with open(path, "rb") as f:
+                        client.put_stream(key, f)
+                except OSError as e:
+                    print(f"[PUT Error] {e}")
+            elif action == "download" and len(parts) == 3:
+                key, path = parts[1], parts[2]
+                try:
+                    size = 0
+                    with open(path, "wb") as f:
+                        for chunk in client.get_stream(key):
+                            f.write(chunk)
+                            size += len(chunk)
+                    print(f"[GET Success] {size} bytes written to {path}")
+                except Exception as e:
+                    print(f"[GET Error] {e}")
+            elif action == "scan" and len(parts) <= 2:
+                prefix = parts[1] if len(parts) == 2 else ""
+                try:
+                    count = 0
+                    for key, value in client.scan(prefix):
+                        print(f"{key} = {value}")
+                        count += 1
+                    print(f"[SCAN Success] {count} keys")
+                except Exception as e:
+                    print(f"[SCAN Error] {e}")
             elif action == "show_ring" or action == "s":
                 client.show_ring()
             elif action == "refresh" or action == "r":
@@ -99,7 +321,7 @@ def main():
                 print("Bye!")
                 break
             else:
-                print("Commands: put <key> <value> | get <key> | show_ring | refresh | exit")
+                print("Commands: put <key> <value> | putex <key> <seconds> <value> | get <key> | upload <key> <file> | download <key> <file> | scan [prefix] | show_ring | refresh | exit")
         except KeyboardInterrupt:
             print("\nBye!")
             break
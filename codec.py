@@ -0,0 +1,231 @@
+import json
+import threading
+import time
+import zlib
+from typing import Optional
+from config import COMPRESSION_ENABLED, COMPRESSION_THRESHOLD, COMPRESSION_LEVEL
+
+
+class InflateLimitExceeded(ValueError):
+    """
+    Raised when compressed data inflates past the allowed size.
+    """
+
+
+def accepts_coding(header: str, coding: str) -> bool:
+    """
+    Returns whether an Accept-Encoding header value accepts coding. Tokens are
+    matched whole, and a coding listed with q=0 is refused, as is any coding
+    not listed unless a "*" token accepts it.
+    """
+    listed = wildcard = None
+    for token in header.split(","):
+        name, _, params = token.partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            attr, _, val = param.partition("=")
+            if attr.strip().lower() == "q":
+                try:
+                    q = float(val)
+                except ValueError:
+                    q = 0.0
+        if name == coding:
+            listed = q > 0
+        elif name == "*":
+            wildcard = q > 0
+    return listed if listed is not None else bool(wildcard)
+
+
+class BoundedInflater:
+    """
+    Inflates a zlib stream fed in pieces, refusing to produce more than max_size
+    bytes in total so a small compressed body cannot expand without limit.
+    """
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.d = zlib.decompressobj()
+
+    def feed(self, data) -> bytes:
+        out = self.d.decompress(data, self.max_size - self.size + 1)
+        return self._count(out, bool(self.d.unconsumed_tail))
+
+    def finish(self) -> bytes:
+        """
+        Returns the last of the output; raises zlib.error if the stream was cut short.
+        """
+        out = self._count(self.d.flush(), False)
+        if not self.d.eof:
+            raise zlib.error("incomplete or truncated stream")
+        return out
+
+    def _count(self, out: bytes, truncated: bool) -> bytes:
+        self.size += len(out)
+        if truncated or self.size > self.max_size:
+            raise InflateLimitExceeded(f"data inflates past {self.max_size} bytes")
+        return out
+
+
+class CompressedValue:
+    """
+    A stored value kept in compressed form, with enough metadata to restore it.
+    """
+    __slots__ = ("data", "is_text", "size")
+
+    def __init__(self, data: bytes, is_text: bool, size: int) -> None:
+        self.data = data
+        self.is_text = is_text
+        self.size = size
+
+
+class CompressionStats:
+    """
+    Running totals of compression work done by one codec.
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.compressed = 0         # payloads stored or sent compressed
+        self.skipped = 0            # payloads that did not shrink and were kept raw
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.compress_seconds = 0.0
+        self.decompressed = 0
+        self.decompress_seconds = 0.0
+
+    def record_compress(self, raw_size: int, out_size: int, seconds: float, kept: bool) -> None:
+        with self.lock:
+            self.compress_seconds += seconds
+            if kept:
+                self.compressed += 1
+                self.raw_bytes += raw_size
+                self.compressed_bytes += out_size
+            else:
+                self.skipped += 1
+
+    def record_decompress(self, seconds: float) -> None:
+        with self.lock:
+            self.decompressed += 1
+            self.decompress_seconds += seconds
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            ratio = self.raw_bytes / self.compressed_bytes if self.compressed_bytes else 1.0
+            return {
+                "compressed": self.compressed,
+                "skipped": self.skipped,
+                "raw_bytes": self.raw_bytes,
+                "compressed_bytes": self.compressed_bytes,
+                "ratio": round(ratio, 3),
+                "compress_cpu_seconds": round(self.compress_seconds, 6),
+                "decompressed": self.decompressed,
+                "decompress_cpu_seconds": round(self.decompress_seconds, 6),
+            }
+
+
+class ZlibCodec:
+    """
+    Compresses values and peer payloads with zlib once they pass a size threshold.
+    Peers only receive compressed bodies after advertising the coding through an
+    `Accept-Encoding` response header, so nodes without it keep getting plain JSON.
+    Another codec can be swapped in by providing the same methods and `name`.
+    """
+    name = "deflate"
+
+    def __init__(self, level: int = COMPRESSION_LEVEL, threshold: int = COMPRESSION_THRESHOLD,
+                 enabled: bool = COMPRESSION_ENABLED) -> None:
+        self.level = level
+        self.threshold = threshold
+        self.enabled = enabled
+        self.stats = CompressionStats()
+        self.peers = set()  # peer ids that accept compressed request bodies
+
+    def compress(self, data) -> Optional[bytes]:
+        """
+        Returns the compressed form of data, or None if it is below the threshold
+        or does not get smaller.
+        """
+        if not self.enabled or len(data) < self.threshold:
+            return None
+        start = time.thread_time()
+        out = zlib.compress(data, self.level)
+        kept = len(out) < len(data)
+        self.stats.record_compress(len(data), len(out), time.thread_time() - start, kept)
+        return out if kept else None
+
+    def decompress(self, data, max_size: Optional[int] = None) -> bytes:
+        """
+        Inflates data. With max_size, raises InflateLimitExceeded rather than
+        produce more than that many bytes.
+        """
+        start = time.thread_time()
+        if max_size is None:
+            out = zlib.decompress(data)
+        else:
+            inflater = BoundedInflater(max_size)
+            out = inflater.feed(data) + inflater.finish()
+        self.stats.record_decompress(time.thread_time() - start)
+        return out
+
+    def iter_decompress(self, data, chunk_size: int):
+        """
+        Yields the decompressed form of data in chunks of at most chunk_size bytes.
+        """
+        start = time.thread_time()
+        d = zlib.decompressobj()
+        view = memoryview(data)
+        for i in range(0, len(view), chunk_size):
+            buf = view[i:i + chunk_size]
+            while buf:
+                out = d.decompress(buf, chunk_size)
+                buf = d.unconsumed_tail
+                if out:
+                    yield out
+        tail = d.flush()
+        if tail:
+            yield tail
+        self.stats.record_decompress(time.thread_time() - start)
+
+    def encode_value(self, value):
+        """
+        Returns the form a value is stored in: a CompressedValue when compression
+        pays off, otherwise the value unchanged.
+        """
+        is_text = isinstance(value, str)
+        raw = value.encode("utf-8") if is_text else value
+        compressed = self.compress(raw)
+        if compressed is None:
+            return value
+        return CompressedValue(compressed, is_text, len(raw))
+
+    def decode_value(self, stored):
+        """
+        Inverse of encode_value: returns a str or a read-only memoryview.
+        """
+        if not isinstance(stored, CompressedValue):
+            return stored
+        raw = self.decompress(stored.data)
+        return raw.decode("utf-8") if stored.is_text else memoryview(raw)
+
+    def encode_json(self, peer: str, payload: dict) -> tuple[bytes, dict]:
+        """
+        Serializes payload into a request body and headers for peer, compressing it
+        only if the peer has advertised support.
+        """
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if peer in self.peers:
+            compressed = self.compress(body)
+            if compressed is not None:
+                body = compressed
+                headers["Content-Encoding"] = self.name
+        return body, headers
+
+    def note_peer(self, peer: str, headers) -> None:
+        """
+        Records whether peer accepts compressed bodies, based on its response headers.
+        """
+        if accepts_coding(headers.get("Accept-Encoding", ""), self.name):
+            self.peers.add(peer)
+        else:
+            self.peers.discard(peer)
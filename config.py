@@ -19,3 +19,64 @@ FAILURE_DETECT_INTERVAL = 3        # Time between failure detection rounds
 # Consistent Hashing
 # ===================
 VIRTUAL_NODE_REPLICAS = 100        # Number of virtual nodes per physical node
+
+# ===============
+# Data Migration
+# ===============
+MIGRATION_INTERVAL = 5             # Seconds between checks for a routing table change to migrate on
+
+# =====
+# Scan
+# =====
+SCAN_PAGE_SIZE = 100               # Default number of keys per scan page
+SCAN_MAX_PAGE_SIZE = 1000          # Upper bound a node will serve in one scan page
+
+# ==========
+# Streaming
+# ==========
+STREAM_CHUNK_SIZE = 64 * 1024      # Bytes per chunk for large-object upload/download
+
+# ============
+# Compression
+# ============
+COMPRESSION_ENABLED = True         # Compress stored values and peer payloads above the threshold
+COMPRESSION_THRESHOLD = 1024       # Minimum size in bytes before compression is attempted
+COMPRESSION_LEVEL = 6              # zlib level (1 = fastest, 9 = smallest)
+MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024  # Largest size a compressed request body may inflate to
+
+# ===============
+# Routing Watch
+# ===============
+WATCH_TIMEOUT = 30                 # Max seconds a /routing_table/watch long-poll is held open
+
+# =====
+# TTL
+# =====
+TTL_SWEEP_INTERVAL = 1             # Seconds between background sweeps for expired keys
+
+# =========
+# Hot Keys
+# =========
+HOT_KEY_TOP_K = 16                 # Number of heavy-hitter keys tracked per node
+HOT_KEY_SKETCH_WIDTH = 2048        # Counters per count-min sketch row
+HOT_KEY_SKETCH_DEPTH = 4           # Rows (independent hashes) in the count-min sketch
+HOT_KEY_INTERVAL = 5               # Seconds between hot-key rounds; counts are halved each round
+HOT_KEY_READ_THRESHOLD = 1000      # Estimated reads in a round before a key is replicated
+HOT_KEY_MAX_WRITE_RATIO = 0.1      # Max writes/reads for a hot key to count as read-mostly
+HOT_KEY_REPLICAS = 2               # Extra nodes that serve reads for a hot key
+HOT_KEY_LEASE = 15                 # Seconds a read replica lives unless the owner renews it
+
+# ============
+# Bulk Loading
+# ============
+BULK_BATCH_SIZE = 1000             # Records per /kv/batch request
+BULK_CHUNK_SIZE = 50000            # Records read and partitioned at a time; the unit of resume progress
+BULK_CONCURRENCY = 4               # Concurrent batch requests per node
+BULK_MAX_RETRIES = 3               # Attempts per batch before the load is aborted
+
+# ==============
+# Decommission
+# ==============
+HANDOFF_BATCH_SIZE = 500           # Keys per batch when a leaving node hands data to its successors
+LEAVE_ANNOUNCE_ROUNDS = 3          # Extra gossip rounds a leaving node sends to announce its removal
+LEAVE_HANDOFF_RETRIES = 5          # Attempts to hand off keys written during the drain, with backoff
@@ -1,6 +1,7 @@
 import threading
 import time
 import requests
+from config import STREAM_CHUNK_SIZE, HANDOFF_BATCH_SIZE, MIGRATION_INTERVAL
 
 class DataMigrator:
     def __init__(self, node):
@@ -16,7 +17,7 @@ class DataMigrator:
 
     def _migration_loop(self):
         while self.running:
-            time.sleep(5)  # 每5秒检测一次（可配置）
+            time.sleep(MIGRATION_INTERVAL)  # 每 MIGRATION_INTERVAL 秒检测一次
             self._check_and_migrate()
 
     def _check_and_migrate(self):
@@ -34,7 +35,7 @@ class DataMigrator:
         for key in list(self.node.storage.keys()):
             responsible_node = self.node.routing_table.get_responsible_node(key)
             if responsible_node.node_id != self.node.node_id:
-                keys_to_move.append((key, self.node.storage[key], responsible_node))
+                keys_to_move.append((key, responsible_node))
 
         if not keys_to_move:
             print("[Migrator] No data to migrate.")
@@ -42,15 +43,127 @@ class DataMigrator:
 
         print(f"[Migrator] {len(keys_to_move)} keys need to be moved.")
 
-        for key, value, target_node in keys_to_move:
+        codec = self.node.codec
+        expiry = self.node.expiry
+        for key, target_node in keys_to_move:
             try:
-                url = f"http://{target_node.host}:{target_node.port}/kv"
+                if expiry.expire_if_due(key) or key not in self.node.storage:
+                    continue  # expired while waiting to move
+                value = codec.decode_value(self.node.storage[key])
+                # Moved keys keep their remaining lifetime rather than a fresh TTL
+                ttl = expiry.remaining(key)
                 headers = {"Routing-Version": str(self.node.routing_table.version)}
-                resp = requests.put(url, json={"key": key, "value": value}, headers=headers)
-                if resp.status_code == 200:
-                    del self.node.storage[key]
+                ok, detail = self._put_key(target_node.node_id, key, value, ttl, headers)
+                if ok:
+                    with expiry.lock:
+                        self.node.storage.pop(key, None)
+                        expiry.clear(key)
                     print(f"[Migrator] Migrated key '{key}' to {target_node.node_id}")
                 else:
-                    print(f"[Migrator] Failed to migrate key '{key}' to {target_node.node_id}: {resp.text}")
+                    print(f"[Migrator] Failed to migrate key '{key}' to {target_node.node_id}: {detail}")
             except Exception as e:
                 print(f"[Migrator] Error migrating key '{key}': {e}")
+
+    def _put_key(self, target_id, key, value, ttl, headers):
+        """
+        Sends one key to target_id and returns (accepted, detail). Binary values go
+        through the streaming endpoint in raw chunks. This and _put_batch are the
+        transport hooks a simulator overrides.
+        """
+        codec = self.node.codec
+        if isinstance(value, memoryview):
+            chunks = (value[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(value), STREAM_CHUNK_SIZE))
+            params = {"key": key} if ttl is None else {"key": key, "ttl": ttl}
+            resp = requests.put(f"http://{target_id}/kv/stream", params=params, data=chunks, headers=headers)
+        else:
+            body, body_headers = codec.encode_json(target_id, {"key": key, "value": value, "ttl": ttl})
+            resp = requests.put(f"http://{target_id}/kv", data=body, headers={**headers, **body_headers})
+        codec.note_peer(target_id, resp.headers)
+        return resp.status_code == 200, resp.text
+
+    def _put_batch(self, target_id, items, headers):
+        """
+        Sends a batch of JSON items to target_id and returns the keys it rejected.
+        """
+        codec = self.node.codec
+        body, body_headers = codec.encode_json(target_id, {"items": items})
+        resp = requests.put(f"http://{target_id}/kv/batch", data=body, headers={**headers, **body_headers})
+        codec.note_peer(target_id, resp.headers)
+        resp.raise_for_status()
+        return resp.json()["rejected"]
+
+    def _delete_batch(self, target_id, keys, headers):
+        """
+        Asks target_id to drop its handed-off copies of keys.
+        """
+        codec = self.node.codec
+        body, body_headers = codec.encode_json(target_id, {"keys": keys})
+        resp = requests.delete(f"http://{target_id}/kv/batch", data=body, headers={**headers, **body_headers})
+        codec.note_peer(target_id, resp.headers)
+        resp.raise_for_status()
+
+    def handoff(self, ring, keys=None):
+        """
+        Copies keys (default: all local keys) to their owners in `ring`, a ring
+        that no longer contains this node, in bulk batches. Requests carry a
+        Leaving-Node header so receivers accept keys before they have heard of the
+        new ring. Local copies are kept, so this node keeps serving reads.
+        Returns (number of keys handed off, keys that could not be handed off).
+        """
+        codec = self.node.codec
+        expiry = self.node.expiry
+        if keys is None:
+            keys = list(self.node.storage.keys())
+        headers = {"Leaving-Node": self.node.node_id}
+        sent, failed = 0, []
+        for target_id, idxs in ring.partition(keys).items():
+            for start in range(0, len(idxs), HANDOFF_BATCH_SIZE):
+                items = []
+                for i in idxs[start:start + HANDOFF_BATCH_SIZE]:
+                    key = keys[i]
+                    stored = self.node.storage.get(key)
+                    ttl = expiry.remaining(key)
+                    if stored is None or (ttl is not None and ttl <= 0):
+                        continue  # deleted or expired since the key list was taken
+                    value = codec.decode_value(stored)
+                    if isinstance(value, memoryview):
+                        try:
+                            ok, _ = self._put_key(target_id, key, value, ttl, headers)
+                        except Exception as e:
+                            print(f"[Migrator] Error handing off '{key}' to {target_id}: {e}")
+                            ok = False
+                        if ok:
+                            sent += 1
+                        else:
+                            failed.append(key)
+                        continue
+                    items.append({"key": key, "value": value, "ttl": ttl})
+                if not items:
+                    continue
+                try:
+                    rejected = self._put_batch(target_id, items, headers)
+                    sent += len(items) - len(rejected)
+                    failed.extend(rejected)
+                except Exception as e:
+                    print(f"[Migrator] Error handing off {len(items)} keys to {target_id}: {e}")
+                    failed.extend(item["key"] for item in items)
+            print(f"[Migrator] Handed off keys to {target_id}")
+        return sent, failed
+
+    def revoke(self, ring, keys):
+        """
+        Undoes a handoff of keys to `ring` when the leave is aborted: each receiver
+        drops the copies it took on this node's behalf, so it never migrates them
+        back over newer writes. Returns the keys whose copies could not be dropped.
+        """
+        headers = {"Leaving-Node": self.node.node_id}
+        failed = []
+        for target_id, idxs in ring.partition(keys).items():
+            for start in range(0, len(idxs), HANDOFF_BATCH_SIZE):
+                batch = [keys[i] for i in idxs[start:start + HANDOFF_BATCH_SIZE]]
+                try:
+                    self._delete_batch(target_id, batch, headers)
+                except Exception as e:
+                    print(f"[Migrator] Error withdrawing {len(batch)} keys from {target_id}: {e}")
+                    failed.extend(batch)
+        return failed
@@ -0,0 +1,97 @@
+import heapq
+import math
+import threading
+import time
+from typing import Optional
+from config import TTL_SWEEP_INTERVAL
+
+
+class ExpiryManager:
+    """
+    Tracks per-key deadlines for one node's storage and removes keys once they
+    expire. Deadlines live in a min-heap, so a sweep only touches keys that are
+    actually due; overwritten deadlines stay in the heap and are skipped when
+    popped, and the heap is rebuilt once stale entries dominate it.
+    """
+    def __init__(self, storage: dict, clock=time.monotonic) -> None:
+        self.storage = storage
+        self.clock = clock
+        self.deadlines = {}  # key -> absolute deadline
+        self.heap = []       # (deadline, key), may hold stale entries
+        self.lock = threading.RLock()
+        self.running = False
+
+    def start(self) -> None:
+        """
+        Starts the background sweeper.
+        """
+        self.running = True
+        threading.Thread(target=self._expiry_loop, daemon=True).start()
+
+    def _expiry_loop(self) -> None:
+        while self.running:
+            self.expire_due()
+            time.sleep(TTL_SWEEP_INTERVAL)
+
+    def set(self, key: str, ttl: Optional[float]) -> None:
+        """
+        Gives key a lifetime of ttl seconds from now, or clears it if ttl is None.
+        """
+        if ttl is not None and not math.isfinite(ttl):
+            # A NaN deadline never compares as due and would wedge the heap
+            raise ValueError(f"ttl must be finite, got {ttl}")
+        with self.lock:
+            if ttl is None:
+                self.deadlines.pop(key, None)
+                return
+            deadline = self.clock() + ttl
+            self.deadlines[key] = deadline
+            heapq.heappush(self.heap, (deadline, key))
+            if len(self.heap) > 2 * len(self.deadlines) + 64:
+                self.heap = [(d, k) for k, d in self.deadlines.items()]
+                heapq.heapify(self.heap)
+
+    def clear(self, key: str) -> None:
+        self.set(key, None)
+
+    def remaining(self, key: str) -> Optional[float]:
+        """
+        Returns the seconds key has left, or None if it has no TTL.
+        """
+        deadline = self.deadlines.get(key)
+        if deadline is None:
+            return None
+        return max(0.0, deadline - self.clock())
+
+    def is_expired(self, key: str, now: Optional[float] = None) -> bool:
+        deadline = self.deadlines.get(key)
+        if deadline is None:
+            return False
+        return deadline <= (self.clock() if now is None else now)
+
+    def expire_if_due(self, key: str) -> bool:
+        """
+        Lazily removes key on access if its deadline has passed. Returns True if it did.
+        """
+        with self.lock:
+            if not self.is_expired(key):
+                return False
+            self.deadlines.pop(key, None)
+            self.storage.pop(key, None)
+            return True
+
+    def expire_due(self) -> list[str]:
+        """
+        Removes every key whose deadline has passed and returns them.
+        """
+        expired = []
+        with self.lock:
+            now = self.clock()
+            while self.heap and self.heap[0][0] <= now:
+                deadline, key = heapq.heappop(self.heap)
+                if self.deadlines.get(key) != deadline:
+                    continue  # stale entry: key was rewritten or its TTL cleared
+                del self.deadlines[key]
+                self.storage.pop(key, None)
+                expired.append(key)
+        return expired
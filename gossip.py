@@ -3,6 +3,7 @@ import time
 import random
 import requests
 from routing_table import RoutingTable
+from codec import ZlibCodec
 from utils import get_host_port
 from config import (
     GOSSIP_FANOUT,
@@ -16,12 +17,18 @@ class GossipManager:
     """
     A class for one node that manages gossiping between nodes in the network.
     """
-    def __init__(self, self_node_id: str, routing_table: RoutingTable) -> None:
+    def __init__(self, self_node_id: str, routing_table: RoutingTable, codec: ZlibCodec = None,
+                 clock=time.time, rng=random) -> None:
         self.self_node_id = self_node_id
         self.routing_table = routing_table
+        self.codec = codec or ZlibCodec()
+        self.clock = clock                           # time source, replaceable for simulation
+        self.rng = rng                               # peer selection randomness, seedable for simulation
         self.heartbeat_map = {self_node_id: 0}       # heartbeat map of this node (keep incrementing)
-        self.last_seen = {self_node_id: time.time()} # last time we heard alive signal from this node
+        self.last_seen = {self_node_id: clock()}     # last time we heard alive signal from this node
         self.status_map = {self_node_id: "alive"}    # alive status of this node
+        self.local_hot_keys = []                     # this node's heavy hitters, shared with peers
+        self.cluster_hot_keys = {}                   # node_id -> heavy hitters last gossiped by that node
         self.lock = threading.Lock()
         self.running = False
 
@@ -39,20 +46,23 @@ class GossipManager:
         A loop that sends heartbeats to other nodes in the network.
         """
         while self.running:
-            with self.lock:
-                self.heartbeat_map[self.self_node_id] += 1
-                self.last_seen[self.self_node_id] = time.time()
+            self.heartbeat_tick()
             time.sleep(HEARTBEAT_INTERVAL)
 
+    def heartbeat_tick(self) -> None:
+        """
+        Increments this node's own heartbeat.
+        """
+        with self.lock:
+            self.heartbeat_map[self.self_node_id] += 1
+            self.last_seen[self.self_node_id] = self.clock()
+
     def _gossip_loop(self) -> None:
         """
         A loop that sends gossip messages to other nodes in the network.
         """
         while self.running:
-            peers = [n for n in self.routing_table.node_map.keys() if n != self.self_node_id]
-            if peers:
-                targets = random.sample(peers, min(GOSSIP_FANOUT, len(peers)))
-                self._send_gossip(targets)
+            self.force_gossip_once()
             time.sleep(GOSSIP_INTERVAL)
 
     def _send_gossip(self, targets: list[str]) -> None:
@@ -62,45 +72,63 @@ class GossipManager:
         with self.lock:
             payload = {
                 "sender": self.self_node_id,
-                "heartbeat_map": self.heartbeat_map,
-                "routing_table": self.routing_table.serialize()
+                "heartbeat_map": dict(self.heartbeat_map),
+                "routing_table": self.routing_table.serialize(),
+                "hot_keys": self.local_hot_keys
             }
         for target in targets:
             try:
-                host, port = get_host_port(target)
-                url = f"http://{host}:{port}/gossip"
-                requests.post(url, json=payload, timeout=1)
+                self._post(target, payload)
             except Exception:
-                pass  
+                pass
+
+    def _post(self, target: str, payload: dict) -> None:
+        """
+        Delivers one gossip message over HTTP. This is the transport hook a
+        simulator overrides.
+        """
+        host, port = get_host_port(target)
+        url = f"http://{host}:{port}/gossip"
+        body, headers = self.codec.encode_json(target, payload)
+        resp = requests.post(url, data=body, headers=headers, timeout=1)
+        self.codec.note_peer(target, resp.headers)
 
     def _failure_detector_loop(self) -> None:
         """
         A loop that detects dead nodes and removes them from the routing table.
         """
         while self.running:
-            now = time.time()
-            dead = []
-            with self.lock:
-                for node_id, ts in self.last_seen.items():
-                    if node_id == self.self_node_id:
-                        continue
-                    if now - ts > FAILURE_HARD_DEAD and self.status_map.get(node_id) != "dead":
-                        self.status_map[node_id] = "dead"
-                        dead.append(node_id)
-            for node_id in dead:
-                print(f"[Gossip] Node {node_id} marked as DEAD")
-                host, port = get_host_port(node_id)
-                self.routing_table.remove_node(host, port)
-                # Clean up dead nodes from maintained variables
-                with self.lock:
-                    try:
-                        del self.heartbeat_map[node_id]
-                        del self.last_seen[node_id]
-                        del self.status_map[node_id]
-                    except KeyError:
-                        pass
+            self.detect_failures()
             time.sleep(FAILURE_DETECT_INTERVAL)
 
+    def detect_failures(self) -> None:
+        """
+        Marks nodes not heard from in FAILURE_HARD_DEAD seconds as dead and
+        removes them from the routing table.
+        """
+        now = self.clock()
+        dead = []
+        with self.lock:
+            for node_id, ts in self.last_seen.items():
+                if node_id == self.self_node_id:
+                    continue
+                if now - ts > FAILURE_HARD_DEAD and self.status_map.get(node_id) != "dead":
+                    self.status_map[node_id] = "dead"
+                    dead.append(node_id)
+        for node_id in dead:
+            print(f"[Gossip] Node {node_id} marked as DEAD")
+            host, port = get_host_port(node_id)
+            self.routing_table.remove_node(host, port)
+            # Clean up dead nodes from maintained variables
+            with self.lock:
+                try:
+                    del self.heartbeat_map[node_id]
+                    del self.last_seen[node_id]
+                    del self.status_map[node_id]
+                except KeyError:
+                    pass
+                self.cluster_hot_keys.pop(node_id, None)
+
     def receive_gossip(self, data: dict) -> None:
         """
         Receives a gossip message from another node.
@@ -114,12 +142,17 @@ class GossipManager:
             return
 
         with self.lock:
+            # Older peers do not send hot keys
+            hot_keys = data.get("hot_keys")
+            if isinstance(hot_keys, list):
+                self.cluster_hot_keys[data["sender"]] = hot_keys
+
             incoming_hb = data.get("heartbeat_map", {})
             for node_id, hb in incoming_hb.items():
                 local_hb = self.heartbeat_map.get(node_id, -1)
                 if hb > local_hb:
                     self.heartbeat_map[node_id] = hb
-                    self.last_seen[node_id] = time.time()
+                    self.last_seen[node_id] = self.clock()
                     self.status_map[node_id] = "alive"
 
             remote_rt = data.get("routing_table", {})
@@ -140,5 +173,5 @@ class GossipManager:
         """
         peers = [n for n in self.routing_table.node_map.keys() if n != self.self_node_id]
         if peers:
-            targets = random.sample(peers, min(GOSSIP_FANOUT, len(peers)))
+            targets = self.rng.sample(peers, min(GOSSIP_FANOUT, len(peers)))
             self._send_gossip(targets)
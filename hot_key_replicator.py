@@ -0,0 +1,204 @@
+import itertools
+import threading
+import time
+import requests
+from hotkeys import HotKeyTracker
+from config import (
+    HOT_KEY_INTERVAL,
+    HOT_KEY_READ_THRESHOLD,
+    HOT_KEY_MAX_WRITE_RATIO,
+    HOT_KEY_REPLICAS,
+    HOT_KEY_LEASE
+)
+
+PUSH_TIMEOUT = 1  # seconds a replica push or invalidation may take
+
+class HotKeyReplicator:
+    """
+    Detects hot read-mostly keys owned by this node and pushes short-lived read
+    replicas of them to the next nodes on the ring. Also holds the replicas this
+    node serves on behalf of other owners.
+    """
+    def __init__(self, node):
+        self.node = node
+        self.tracker = HotKeyTracker()
+        self.replicated = {}  # owned key -> replica node ids
+        self.pushing = {}     # owned key -> [target ids, invalidated] while a push is in flight
+        self.leases = {}      # owned key -> latest time any replica of it can still be served
+        self.invalidating = {}  # owned key -> Event set once its latest invalidation has finished
+        self.replicas = {}    # key -> (value or None once dropped, deadline, version) for other owners
+        # Orders pushes against invalidations; seeded from the clock so it keeps growing across restarts
+        self.versions = itertools.count(time.time_ns())
+        self.lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._replication_loop, daemon=True).start()
+
+    def _replication_loop(self):
+        while self.running:
+            time.sleep(HOT_KEY_INTERVAL)
+            self._replicate_round()
+
+    def _replicate_round(self):
+        hot = self.tracker.hot_keys()
+        self.node.gossip.local_hot_keys = hot
+        wanted = [
+            key for key in self.tracker.read_mostly(HOT_KEY_READ_THRESHOLD, HOT_KEY_MAX_WRITE_RATIO)
+            if self.node.is_responsible(key)
+        ]
+        # Push (or renew the lease of) every hot key, then invalidate the ones that cooled off
+        for key in wanted:
+            self._push(key)
+        with self.lock:
+            cooled = [key for key in self.replicated if key not in wanted]
+        for key in cooled:
+            self.invalidate(key)
+        self.tracker.decay()
+        self._purge_expired_replicas()
+        if hot:
+            print(f"[HotKeys] Top key '{hot[0]['key']}' ~{hot[0]['reads']} reads, {len(wanted)} replicated")
+
+    def _push(self, key):
+        targets = self.node.routing_table.get_successor_nodes(key, HOT_KEY_REPLICAS)
+        if not targets:
+            return
+        with self.lock:
+            # Taken before the value is read: a write that lands after the read
+            # invalidates with a newer version, which replicas then hold on to
+            version = next(self.versions)
+            self.pushing[key] = [[t.node_id for t in targets], False]
+            lease = HOT_KEY_LEASE
+            # A replica's lease starts when the push reaches it, at most PUSH_TIMEOUT from now
+            self.leases[key] = max(self.leases.get(key, 0), time.monotonic() + PUSH_TIMEOUT + lease)
+        pushed = []
+        try:
+            self.node.expiry.expire_if_due(key)
+            stored = self.node.storage.get(key)
+            if stored is None:
+                return
+            value = self.node.codec.decode_value(stored)
+            if not isinstance(value, str):
+                return  # only JSON-readable values are served from replicas
+            ttl = self.node.expiry.remaining(key)
+            if ttl is not None:
+                lease = min(lease, ttl)
+            for target in targets:
+                try:
+                    url = f"http://{target.host}:{target.port}/replica"
+                    payload = {"key": key, "value": value, "lease": lease, "version": version}
+                    body, headers = self.node.codec.encode_json(target.node_id, payload)
+                    resp = requests.put(url, data=body, headers=headers, timeout=PUSH_TIMEOUT)
+                    self.node.codec.note_peer(target.node_id, resp.headers)
+                    if resp.status_code == 200:
+                        pushed.append(target.node_id)
+                except Exception as e:
+                    print(f"[HotKeys] Error replicating '{key}' to {target.node_id}: {e}")
+        finally:
+            with self.lock:
+                _, invalidated = self.pushing.pop(key)
+                # A write during the push already dropped these replicas; do not advertise them
+                if pushed and not invalidated:
+                    self.replicated[key] = pushed
+                else:
+                    self.replicated.pop(key, None)
+
+    def _purge_expired_replicas(self):
+        now = time.monotonic()
+        with self.lock:
+            for key in [k for k, (_, deadline, _) in self.replicas.items() if deadline <= now]:
+                del self.replicas[key]
+            for key in [k for k, deadline in self.leases.items() if deadline <= now]:
+                del self.leases[key]
+
+    def replicas_of(self, key):
+        with self.lock:
+            return self.replicated.get(key)
+
+    def invalidate(self, key):
+        """
+        Drops every replica of key before returning, so a write acknowledged after
+        this call is never followed by a stale replica read. Replicas that cannot be
+        reached are waited out until their lease ends, and a call that overlaps an
+        earlier invalidation of the same key also waits for that one to finish.
+        Called on every write to an owned key and when a key cools off.
+        """
+        with self.lock:
+            targets = set(self.replicated.pop(key, ()))
+            if key in self.pushing:
+                # A push in flight may still land; its targets must refuse it
+                self.pushing[key][1] = True
+                targets.update(self.pushing[key][0])
+            # An earlier invalidation may still be dropping replicas this call no longer sees
+            earlier = self.invalidating.get(key)
+            if targets:
+                version = next(self.versions)
+                lease_end = self.leases.get(key, 0)
+                done = self.invalidating[key] = threading.Event()
+        if not targets:
+            if earlier is not None:
+                earlier.wait()
+            return
+        try:
+            if not self._send_invalidations(key, targets, version):
+                wait = lease_end - time.monotonic()
+                if wait > 0:
+                    print(f"[HotKeys] Waiting {wait:.1f}s for unreachable replicas of '{key}' to expire")
+                    time.sleep(wait)
+            if earlier is not None:
+                earlier.wait()
+        finally:
+            with self.lock:
+                if self.invalidating.get(key) is done:
+                    del self.invalidating[key]
+            done.set()
+
+    def _send_invalidations(self, key, targets, version):
+        ok = True
+        for node_id in targets:
+            try:
+                resp = requests.delete(
+                    f"http://{node_id}/replica", params={"key": key, "version": version}, timeout=PUSH_TIMEOUT
+                )
+                resp.raise_for_status()
+            except Exception as e:
+                print(f"[HotKeys] Error invalidating '{key}' on {node_id}: {e}")
+                ok = False
+        return ok
+
+    def store_replica(self, key, value, lease, version):
+        """
+        Stores a replica pushed by the owner. Returns False if a newer push or
+        invalidation has already been seen for key.
+        """
+        with self.lock:
+            entry = self.replicas.get(key)
+            if entry is not None and entry[2] >= version:
+                return False
+            self.replicas[key] = (value, time.monotonic() + lease, version)
+            return True
+
+    def drop_replica(self, key, version):
+        """
+        Drops the replica of key, remembering the version so that an older push
+        still in flight is refused.
+        """
+        with self.lock:
+            entry = self.replicas.get(key)
+            if entry is None or entry[2] < version:
+                self.replicas[key] = (None, time.monotonic() + HOT_KEY_LEASE, version)
+
+    def get_replica(self, key):
+        """
+        Returns the replicated value of key, or None if there is no live lease.
+        """
+        with self.lock:
+            entry = self.replicas.get(key)
+            if entry is None or entry[0] is None:
+                return None
+            value, deadline, _ = entry
+            if deadline <= time.monotonic():
+                del self.replicas[key]
+                return None
+            return value
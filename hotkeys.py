@@ -0,0 +1,101 @@
+import threading
+from config import HOT_KEY_TOP_K, HOT_KEY_SKETCH_WIDTH, HOT_KEY_SKETCH_DEPTH
+from utils import hash_str
+
+
+class CountMinSketch:
+    """
+    Approximate per-key counters in fixed memory. Estimates never undercount;
+    they overcount by at most a small fraction of the total with high probability.
+    """
+    def __init__(self, width: int = HOT_KEY_SKETCH_WIDTH, depth: int = HOT_KEY_SKETCH_DEPTH) -> None:
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+
+    def _indexes(self, key: str) -> list[int]:
+        # Derive every row's index from one 64-bit hash (Kirsch-Mitzenmacher)
+        h = hash_str(key)
+        h1, h2 = h & 0xFFFFFFFF, h >> 32
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key: str, count: int = 1) -> int:
+        """
+        Increments key's counters and returns its new estimate.
+        """
+        estimate = None
+        for row, idx in zip(self.rows, self._indexes(key)):
+            row[idx] += count
+            if estimate is None or row[idx] < estimate:
+                estimate = row[idx]
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[idx] for row, idx in zip(self.rows, self._indexes(key)))
+
+    def decay(self) -> None:
+        """
+        Halves every counter so old traffic fades out.
+        """
+        for row in self.rows:
+            for i, v in enumerate(row):
+                if v:
+                    row[i] = v >> 1
+
+
+class HotKeyTracker:
+    """
+    Streaming heavy-hitter tracker for one node: count-min sketches of reads and
+    writes plus the top-k keys by estimated reads.
+    """
+    def __init__(self, k: int = HOT_KEY_TOP_K) -> None:
+        self.k = k
+        self.reads = CountMinSketch()
+        self.writes = CountMinSketch()
+        self.top = {}  # key -> estimated reads, at most k entries
+        self.lock = threading.Lock()
+
+    def record_read(self, key: str) -> None:
+        with self.lock:
+            estimate = self.reads.add(key)
+            if key in self.top or len(self.top) < self.k:
+                self.top[key] = estimate
+                return
+            coldest = min(self.top, key=self.top.get)
+            if estimate > self.top[coldest]:
+                del self.top[coldest]
+                self.top[key] = estimate
+
+    def record_write(self, key: str) -> None:
+        with self.lock:
+            self.writes.add(key)
+
+    def hot_keys(self) -> list[dict]:
+        """
+        Returns the tracked keys, hottest first, with their read and write estimates.
+        """
+        with self.lock:
+            ranked = sorted(self.top.items(), key=lambda kv: kv[1], reverse=True)
+            return [
+                {"key": key, "reads": reads, "writes": self.writes.estimate(key)}
+                for key, reads in ranked
+            ]
+
+    def read_mostly(self, min_reads: int, max_write_ratio: float) -> list[str]:
+        """
+        Returns the tracked keys with at least min_reads reads and a writes/reads
+        ratio no higher than max_write_ratio.
+        """
+        return [
+            h["key"] for h in self.hot_keys()
+            if h["reads"] >= min_reads and h["writes"] <= h["reads"] * max_write_ratio
+        ]
+
+    def decay(self) -> None:
+        """
+        Halves all counts and forgets top-k entries that have gone cold.
+        """
+        with self.lock:
+            self.reads.decay()
+            self.writes.decay()
+            self.top = {k: v >> 1 for k, v in self.top.items() if v >> 1}
@@ -0,0 +1,86 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+
+class KeyIndex:
+    """
+    Keeps the keys of a node's storage in sorted order so a scan page costs
+    O(log n + limit) instead of a walk over the whole dict. New keys go into a
+    small sorted buffer, which is merged into the main list once it grows past
+    a fraction of it. Removed keys are skipped when read and dropped whenever
+    the list is rebuilt.
+    """
+    def __init__(self, storage: dict, fold_ratio: int = 32, min_fold: int = 1024) -> None:
+        self.storage = storage
+        self.fold_ratio = fold_ratio
+        self.min_fold = min_fold
+        self.sorted = sorted(storage)  # replaced, never mutated, so readers can hold on to it
+        self.pending = []              # sorted keys added since the last fold, none of them in self.sorted
+        self.lock = threading.Lock()
+
+    def add(self, key: str) -> None:
+        """
+        Records a key newly inserted into storage.
+        """
+        with self.lock:
+            if _contains(self.sorted, key) or _contains(self.pending, key):
+                return  # removed and re-added before the list was rebuilt
+            insort(self.pending, key)
+            if len(self.pending) > max(self.min_fold, len(self.sorted) // self.fold_ratio):
+                self._fold()
+
+    def _fold(self) -> None:
+        if len(self.sorted) > 2 * len(self.storage) + self.min_fold:
+            # Mostly removed keys: rebuild from storage instead
+            self.sorted = sorted(self.storage)
+        else:
+            # Two sorted runs, which timsort merges in linear time
+            self.sorted = sorted(self.sorted + self.pending)
+        self.pending = []
+
+    def page(self, prefix: str = "", after: str = None, limit: int = 100, alive=None) -> list[str]:
+        """
+        Returns up to `limit` keys starting with `prefix` and strictly greater than
+        `after`, in sorted order. Keys no longer in storage, or rejected by the
+        optional `alive(key)` check, are skipped.
+        """
+        if after is not None and after >= prefix:
+            start, strict = after, True
+        else:
+            start, strict = prefix, False
+        result = []
+        while len(result) < limit:
+            # Copy only as many pending keys as the page can still use, so a page
+            # costs the same however many keys are waiting to be folded in
+            want = limit - len(result)
+            find = bisect_right if strict else bisect_left
+            with self.lock:
+                keys = self.sorted
+                p = find(self.pending, start)
+                extra = self.pending[p:p + want]
+            i = find(keys, start)
+            j = 0
+            more = len(extra) == want  # pending may hold keys past this slice
+            while len(result) < limit:
+                if j == len(extra) and more:
+                    break  # fetch more pending keys before going further
+                if i < len(keys) and (j == len(extra) or keys[i] < extra[j]):
+                    key = keys[i]
+                    i += 1
+                elif j < len(extra):
+                    key = extra[j]
+                    j += 1
+                else:
+                    return result
+                if not key.startswith(prefix):
+                    # Sorted order: no later key can have the prefix either
+                    return result
+                start, strict = key, True
+                if key in self.storage and (alive is None or alive(key)):
+                    result.append(key)
+        return result
+
+
+def _contains(keys: list[str], key: str) -> bool:
+    i = bisect_left(keys, key)
+    return i < len(keys) and keys[i] == key
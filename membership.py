@@ -0,0 +1,143 @@
+import time
+from config import LEAVE_ANNOUNCE_ROUNDS, LEAVE_HANDOFF_RETRIES
+
+
+class LeaveError(Exception):
+    """
+    Raised when a node cannot leave the ring; carries the HTTP status to answer with.
+    """
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class RingMember:
+    """
+    Key ownership and decommission logic shared by node.Node and the simulator's
+    nodes, so the simulator exercises the same code the servers run.
+
+    Expects node_id, host, port, storage, expiry, routing_table, gossip, migrator,
+    handoff_rings, leaving, left and dirty_keys on the instance.
+    """
+    def is_responsible(self, key, leaving_node=None):
+        node = self.routing_table.get_responsible_node(key)
+        if node.node_id == self.node_id:
+            return True
+        if leaving_node and node.node_id == leaving_node:
+            # A draining node is handing this key over ahead of the ring change
+            return self._ring_without(leaving_node).get_responsible_node(key).node_id == self.node_id
+        return False
+
+    def _ring_without(self, node_id):
+        cache_key = (node_id, self.routing_table.version)
+        ring = self.handoff_rings.get(cache_key)
+        if ring is None:
+            ring = self.routing_table.without_node(node_id)
+            self.handoff_rings = {cache_key: ring}
+        return ring
+
+    def leave(self):
+        """
+        Gracefully removes this node from the ring. Every key is first copied to the
+        node that will own it once this node is gone, while reads are still served
+        here. Only then is the node removed from the ring and the change gossiped.
+        Keys written during the drain are sent in a final pass. If that pass keeps
+        failing, the node holds on to those keys and reports an error; calling
+        leave again retries it.
+        """
+        if self.leaving:
+            raise LeaveError(409, "Node is already leaving")
+        if self.left and not self.dirty_keys:
+            raise LeaveError(409, "Node has already left")
+        if not self.left and len(self.routing_table.node_map) < 2:
+            raise LeaveError(409, "Cannot leave: no other node to hand data to")
+
+        # Holding the migrator lock keeps the background migrator out of the way
+        with self.migrator.lock:
+            self.leaving = True
+            try:
+                sent = 0 if self.left else self._drain()
+                sent += self._hand_off_late_writes()
+            finally:
+                self.leaving = False
+            self._stop_services()
+        self.storage.clear()
+        return {
+            "status": "ok",
+            "message": f"{self.node_id} left the ring",
+            "handed_off": sent,
+        }
+
+    def _drain(self):
+        """
+        Hands every key to its owner on the ring without this node, then removes
+        this node from the ring and announces it. Returns the number of keys sent.
+        """
+        self.dirty_keys = set()
+        future_ring = self.routing_table.without_node(self.node_id)
+        keys = list(self.storage.keys())
+        print(f"[Leave] Draining {len(keys)} keys to successors")
+        sent, failed = self.migrator.handoff(future_ring, keys)
+        if failed:
+            # Take back the copies already handed over, or their receivers would
+            # migrate them back here on the next ring change over newer writes
+            skipped = set(failed)
+            stranded = self.migrator.revoke(future_ring, [k for k in keys if k not in skipped])
+            detail = f"{len(failed)} keys could not be handed off; node stays in the ring"
+            if stranded:
+                detail += f" ({len(stranded)} handed-off copies could not be withdrawn)"
+            raise LeaveError(500, detail)
+
+        self.routing_table.remove_node(self.host, self.port)
+        self.migrator.last_version = self.routing_table.version
+        self.left = True
+        for _ in range(LEAVE_ANNOUNCE_ROUNDS):
+            self.gossip.force_gossip_once()
+        print(f"[Leave] Removed {self.node_id} from the ring (version {self.routing_table.version})")
+        return sent
+
+    def _hand_off_late_writes(self):
+        """
+        Sends the keys written during the drain to their owners, retrying with
+        backoff. Keys that still fail stay in dirty_keys for the next leave call.
+        """
+        sent = 0
+        for attempt in range(LEAVE_HANDOFF_RETRIES):
+            if attempt:
+                self._pause(2 ** (attempt - 1))
+            count, failed = self.migrator.handoff(self.routing_table, list(self.dirty_keys))
+            sent += count
+            self.dirty_keys = set(failed)
+            if not self.dirty_keys:
+                return sent
+        raise LeaveError(
+            500,
+            f"Left the ring, but {len(self.dirty_keys)} keys written during the drain could not be "
+            "handed off and are only held here; call /leave again to retry"
+        )
+
+    def revoke_handoff(self, keys, leaving_node):
+        """
+        Drops the copies of keys that leaving_node handed over before aborting its
+        leave. Keys this node owns in its own right are kept. Returns how many
+        keys were dropped.
+        """
+        removed = 0
+        for key in keys:
+            if self.is_responsible(key) or not self.is_responsible(key, leaving_node):
+                continue
+            with self.expiry.lock:
+                if self.storage.pop(key, None) is not None:
+                    removed += 1
+                self.expiry.clear(key)
+        return removed
+
+    def _stop_services(self):
+        """
+        Stops this node's background work once it has left the ring.
+        """
+        raise NotImplementedError
+
+    def _pause(self, seconds):
+        time.sleep(seconds)
@@ -1,60 +1,248 @@
 from fastapi import FastAPI, Request, HTTPException, Header
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import Optional
 import uvicorn
 import sys
 import requests
 import random
 import logging
+import json
+import base64
+import zlib
+import asyncio
+import math
+import time
 
-from utils import get_host_port
+from utils import get_host_port, encode_cursor, decode_cursor
 from routing_table import RoutingTable
 from gossip import GossipManager
 from data_migrator import DataMigrator
-from config import BOOTSTRAP_NODE
+from codec import ZlibCodec, CompressedValue, BoundedInflater, InflateLimitExceeded, accepts_coding
+from expiry import ExpiryManager
+from hot_key_replicator import HotKeyReplicator
+from key_index import KeyIndex
+from membership import RingMember, LeaveError
+from config import (
+    BOOTSTRAP_NODE,
+    SCAN_PAGE_SIZE,
+    SCAN_MAX_PAGE_SIZE,
+    STREAM_CHUNK_SIZE,
+    WATCH_TIMEOUT,
+    MAX_DECOMPRESSED_SIZE
+)
+
+class DecompressingRequest(Request):
+    """
+    A request whose body is transparently inflated when the sender compressed it.
+    """
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            if self.headers.get("Content-Encoding") == ZlibCodec.name:
+                try:
+                    body = node.codec.decompress(body, MAX_DECOMPRESSED_SIZE)
+                except InflateLimitExceeded as e:
+                    raise HTTPException(status_code=413, detail=str(e))
+                except zlib.error as e:
+                    raise HTTPException(status_code=400, detail=f"Invalid compressed body: {e}")
+            self._body = body
+        return self._body
+
+class DecompressingRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request):
+            return await handler(DecompressingRequest(request.scope, request.receive))
+
+        return route_handler
 
 app = FastAPI()
+app.router.route_class = DecompressingRoute
 
 class PutRequest(BaseModel):
     key: str
     value: str
+    ttl: Optional[float] = None
+
+class BatchPutRequest(BaseModel):
+    items: list[PutRequest]
+
+class BatchDeleteRequest(BaseModel):
+    keys: list[str]
+
+class ReplicaRequest(BaseModel):
+    key: str
+    value: str
+    lease: float
+    version: int
 
 class JoinRequest(BaseModel):
     host: str
     port: int
 
-class Node:
+class RoutingWatch:
+    """
+    Wakes held /routing_table/watch requests when the routing table changes.
+    Changes happen on gossip and request threads, so the event is set on the loop.
+    """
+    def __init__(self):
+        self.loop = None
+        self.event = None
+
+    def bind(self, loop):
+        if loop is not self.loop:
+            self.loop = loop
+            self.event = asyncio.Event()
+
+    def notify(self, version):
+        if self.loop is not None:
+            try:
+                self.loop.call_soon_threadsafe(self._fire)
+            except RuntimeError:
+                pass  # loop already closed: nobody is waiting
+
+    def _fire(self):
+        # Wake everyone waiting on the current event; later waiters get a fresh one
+        event, self.event = self.event, asyncio.Event()
+        event.set()
+
+class Node(RingMember):
     def __init__(self, host, port):
         self.host = host
         self.port = port
         self.node_id = f"{host}:{port}"
         self.storage = {}
+        self.leaving = False     # draining its keys ahead of leaving the ring
+        self.left = False        # removed itself from the ring
+        self.dirty_keys = set()  # keys written while draining
+        self.handoff_rings = {}  # (leaving node, ring version) -> ring without that node
+        self.codec = ZlibCodec()
+        self.expiry = ExpiryManager(self.storage)
+        self.key_index = KeyIndex(self.storage)
 
         self.routing_table = RoutingTable(self_host=self.host, self_port=self.port)
-        self.gossip = GossipManager(self_node_id=self.node_id, routing_table=self.routing_table)
+        self.watch = RoutingWatch()
+        self.routing_table.on_change = self.watch.notify
+        self.gossip = GossipManager(self_node_id=self.node_id, routing_table=self.routing_table, codec=self.codec)
         self.migrator = DataMigrator(self)
+        self.hot_keys = HotKeyReplicator(self)
 
         self.gossip.start()
         self.migrator.start()
+        self.expiry.start()
+        self.hot_keys.start()
 
-    def is_responsible(self, key):
-        node = self.routing_table.get_responsible_node(key)
-        return node.node_id == self.node_id
+    @staticmethod
+    def _check_ttl(ttl):
+        # NaN passes a plain `ttl <= 0` check, so test for a finite number explicitly
+        if ttl is not None and not (math.isfinite(ttl) and ttl > 0):
+            raise HTTPException(status_code=400, detail="ttl must be a positive finite number")
 
-    def put(self, key, value):
-        if self.is_responsible(key):
-            self.storage[key] = value
+    def put(self, key, value, ttl=None, leaving_node=None):
+        self._check_ttl(ttl)
+        if self.is_responsible(key, leaving_node):
+            stored = self.codec.encode_value(value)
+            with self.expiry.lock:
+                is_new = key not in self.storage
+                self.storage[key] = stored
+                self.expiry.set(key, ttl)
+            if is_new:
+                self.key_index.add(key)
+            if self.leaving:
+                self.dirty_keys.add(key)
+            self.hot_keys.tracker.record_write(key)
+            self.hot_keys.invalidate(key)
             return {"status": "ok", "message": f"Key {key} stored on {self.node_id}"}
         else:
             raise HTTPException(status_code=403, detail="This node is not responsible for this key")
 
+    def put_batch(self, items, leaving_node=None):
+        """
+        Stores every item this node is responsible for and returns the keys it
+        rejected, so a bulk loader can re-route them after refreshing its ring.
+        """
+        for item in items:
+            self._check_ttl(item.ttl)
+        stored = 0
+        rejected = []
+        for item in items:
+            if self.is_responsible(item.key, leaving_node):
+                self.put(item.key, item.value, item.ttl, leaving_node)
+                stored += 1
+            else:
+                rejected.append(item.key)
+        return {"status": "ok", "stored": stored, "rejected": rejected}
+
     def get(self, key):
         if self.is_responsible(key):
-            if key in self.storage:
-                return {"key": key, "value": self.storage[key]}
+            self.expiry.expire_if_due(key)
+            stored = self.storage.get(key)
+            if stored is not None:
+                value = self.codec.decode_value(stored)
+                if isinstance(value, memoryview):
+                    try:
+                        value = str(value, "utf-8")
+                    except UnicodeDecodeError:
+                        raise HTTPException(status_code=406, detail="Value is binary, fetch it via /kv/stream")
+                self.hot_keys.tracker.record_read(key)
+                result = {"key": key, "value": value}
+                ttl = self.expiry.remaining(key)
+                if ttl is not None:
+                    result["ttl"] = ttl
+                replicas = self.hot_keys.replicas_of(key)
+                if replicas:
+                    # Lets clients spread reads of this hot key across its replicas
+                    result["replicas"] = replicas
+                return result
             else:
                 raise HTTPException(status_code=404, detail="Key not found")
         else:
+            value = self.hot_keys.get_replica(key)
+            if value is not None:
+                return {"key": key, "value": value, "replica": True}
+            raise HTTPException(status_code=403, detail="This node is not responsible for this key")
+
+    def get_stream(self, key, chunk_size=STREAM_CHUNK_SIZE, accept_encoding=""):
+        """
+        Returns an iterator over the stored value in chunks of raw bytes, and the
+        content encoding of those chunks. Binary values are sliced from the stored
+        memoryview without copying; compressed values are sent as stored when the
+        caller accepts the coding, and inflated chunk by chunk otherwise.
+        """
+        if not self.is_responsible(key):
             raise HTTPException(status_code=403, detail="This node is not responsible for this key")
+        self.expiry.expire_if_due(key)
+        value = self.storage.get(key)
+        if value is None:
+            raise HTTPException(status_code=404, detail="Key not found")
+        if isinstance(value, CompressedValue):
+            if accepts_coding(accept_encoding, self.codec.name):
+                value = memoryview(value.data)
+                return (value[i:i + chunk_size] for i in range(0, len(value), chunk_size)), self.codec.name
+            return self.codec.iter_decompress(value.data, chunk_size), None
+        if isinstance(value, str):
+            value = memoryview(value.encode("utf-8"))
+        return (value[i:i + chunk_size] for i in range(0, len(value), chunk_size)), None
+
+    def scan_keys(self, prefix="", after=None, limit=SCAN_PAGE_SIZE):
+        """
+        Returns up to `limit` live keys starting with `prefix` and strictly greater
+        than `after`, in sorted order, read from the sorted key index.
+        """
+        now = self.expiry.clock()
+        return self.key_index.page(prefix, after, limit, alive=lambda k: not self.expiry.is_expired(k, now))
+
+    def _stop_services(self):
+        for key in list(self.hot_keys.replicated):
+            self.hot_keys.invalidate(key)
+        self.gossip.running = False
+        self.migrator.running = False
+        self.expiry.running = False
+        self.hot_keys.running = False
 
     def check_routing_version(self, client_version):
         if client_version is None:
@@ -97,14 +285,36 @@ class ExcludeGossipFilter(logging.Filter):
 access_log = logging.getLogger("uvicorn.access")
 access_log.addFilter(ExcludeGossipFilter())
 
+@app.middleware("http")
+async def advertise_compression(request: Request, call_next):
+    # Lets peers know they may send us compressed request bodies
+    response = await call_next(request)
+    if node.codec.enabled:
+        response.headers["Accept-Encoding"] = node.codec.name
+    return response
+
+# Writes are plain defs: they wait for hot-key replicas to be invalidated before answering
 @app.put("/kv")
-async def put_kv(req: PutRequest, routing_version: str = Header(None)):
+def put_kv(req: PutRequest, routing_version: str = Header(None)):
     routing_update = node.check_routing_version(routing_version)
-    result = node.put(req.key, req.value)
+    result = node.put(req.key, req.value, req.ttl)
     if routing_update:
         result["routing_table"] = routing_update
     return result
 
+@app.put("/kv/batch")
+def put_kv_batch(req: BatchPutRequest, routing_version: str = Header(None), leaving_node: str = Header(None)):
+    routing_update = node.check_routing_version(routing_version)
+    result = node.put_batch(req.items, leaving_node)
+    if routing_update:
+        result["routing_table"] = routing_update
+    return result
+
+@app.delete("/kv/batch")
+async def delete_kv_batch(req: BatchDeleteRequest, leaving_node: str = Header(...)):
+    # A leaving node that aborted withdraws the copies it handed over
+    return {"status": "ok", "removed": node.revoke_handoff(req.keys, leaving_node)}
+
 @app.get("/kv")
 async def get_kv(key: str, routing_version: str = Header(None)):
     routing_update = node.check_routing_version(routing_version)
@@ -113,15 +323,83 @@ async def get_kv(key: str, routing_version: str = Header(None)):
         result["routing_table"] = routing_update
     return result
 
+@app.put("/kv/stream")
+async def put_kv_stream(key: str, request: Request, ttl: float = None,
+                        routing_version: str = Header(None), leaving_node: str = Header(None)):
+    routing_update = node.check_routing_version(routing_version)
+    if not node.is_responsible(key, leaving_node):
+        # Reject before the body is read so a large upload is not buffered for nothing
+        raise HTTPException(status_code=403, detail="This node is not responsible for this key")
+    inflater = None
+    if request.headers.get("Content-Encoding") == node.codec.name:
+        inflater = BoundedInflater(MAX_DECOMPRESSED_SIZE)
+    buf = bytearray()
+    try:
+        async for chunk in request.stream():
+            buf += inflater.feed(chunk) if inflater else chunk
+        if inflater:
+            buf += inflater.finish()
+    except InflateLimitExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid compressed body: {e}")
+    result = await run_in_threadpool(node.put, key, memoryview(buf).toreadonly(), ttl, leaving_node)
+    result["size"] = len(buf)
+    if routing_update:
+        result["routing_table"] = routing_update
+    return result
+
+@app.get("/kv/stream")
+async def get_kv_stream(key: str, accept_encoding: str = Header("")):
+    chunks, encoding = node.get_stream(key, accept_encoding=accept_encoding)
+    headers = {"Content-Encoding": encoding} if encoding else None
+    return StreamingResponse(chunks, media_type="application/octet-stream", headers=headers)
+
+# Plain def: building a page runs in the threadpool, off the event loop
+@app.get("/scan")
+def scan_kv(prefix: str = "", cursor: str = None, limit: int = SCAN_PAGE_SIZE):
+    limit = max(1, min(limit, SCAN_MAX_PAGE_SIZE))
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    keys = node.scan_keys(prefix, after, limit)
+    next_cursor = encode_cursor(keys[-1]) if len(keys) == limit else None
+
+    def stream():
+        for key in keys:
+            value = node.storage.get(key)
+            if value is not None:
+                value = node.codec.decode_value(value)
+            if isinstance(value, memoryview):
+                encoded = base64.b64encode(value).decode("ascii")
+                yield json.dumps({"key": key, "value": encoded, "encoding": "base64"}) + "\n"
+            elif value is not None:
+                yield json.dumps({"key": key, "value": value}) + "\n"
+        yield json.dumps({"cursor": next_cursor}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/join")
 async def join_network(req: JoinRequest):
     node.routing_table.add_node(req.host, req.port)
     node.gossip.force_gossip_once()
     return {"status": "ok", "message": f"{req.host}:{req.port} added to routing table."}
 
+@app.post("/leave")
+def leave_network():
+    # Plain def: the drain runs in the threadpool so reads keep being served meanwhile
+    try:
+        return node.leave()
+    except LeaveError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
 @app.post("/gossip")
 async def receive_gossip(request: Request):
     data = await request.json()
+    if node.left:
+        # Ignore peers that have not yet heard we left, so we are not re-added locally
+        return {"status": "ok"}
     node.gossip.receive_gossip(data)
     return {"status": "ok"}
 
@@ -129,6 +407,50 @@ async def receive_gossip(request: Request):
 async def get_routing_table():
     return node.routing_table.serialize()
 
+@app.get("/routing_table/watch")
+async def watch_routing_table(since: int = -1, timeout: float = WATCH_TIMEOUT):
+    # Long-poll: hold the request until the ring moves past `since` or the timeout expires
+    node.watch.bind(asyncio.get_running_loop())
+    deadline = time.monotonic() + max(0.0, min(timeout, WATCH_TIMEOUT))
+    while True:
+        # Take the event before checking, so a change in between still wakes us
+        event = node.watch.event
+        remaining = deadline - time.monotonic()
+        if node.routing_table.version > since or remaining <= 0:
+            return node.routing_table.serialize()
+        try:
+            await asyncio.wait_for(event.wait(), remaining)
+        except asyncio.TimeoutError:
+            pass
+
+@app.put("/replica")
+async def put_replica(req: ReplicaRequest):
+    if not node.hot_keys.store_replica(req.key, req.value, req.lease, req.version):
+        raise HTTPException(status_code=409, detail="A newer version of this replica was already seen")
+    return {"status": "ok"}
+
+@app.delete("/replica")
+async def delete_replica(key: str, version: int):
+    node.hot_keys.drop_replica(key, version)
+    return {"status": "ok"}
+
+@app.get("/hot_keys")
+async def get_hot_keys():
+    return {
+        "node_id": node.node_id,
+        "hot_keys": node.hot_keys.tracker.hot_keys(),
+        "replicated": dict(node.hot_keys.replicated),
+        "cluster": dict(node.gossip.cluster_hot_keys),
+    }
+
+@app.get("/stats")
+async def get_stats():
+    return {
+        "node_id": node.node_id,
+        "keys": len(node.storage),
+        "compression": node.codec.stats.to_dict(),
+    }
+
 if __name__ == "__main__":
     if len(sys.argv) < 3:
         print("Usage: python node.py <host> <port>")
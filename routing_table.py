@@ -1,4 +1,7 @@
 from bisect import bisect_right
+from functools import lru_cache
+from operator import attrgetter
+import copy
 import uuid
 from config import VIRTUAL_NODE_REPLICAS
 from utils import hash_str
@@ -30,16 +33,29 @@ class VirtualNode:
         }
 
 
+@lru_cache(maxsize=4096)
+def _virtual_nodes_for(node_id: str, replicas: int) -> tuple[VirtualNode, ...]:
+    """
+    Returns the virtual nodes of a physical node. They never change, so they are
+    hashed once and shared by every routing table in the process.
+    """
+    return tuple(VirtualNode(f"{node_id}#{i}", node_id) for i in range(replicas))
+
+
 class RoutingTable:
     """
     A routing table for a node in the network.
     """
-    def __init__(self, self_host: str, self_port: int) -> None:
+    def __init__(self, self_host: str, self_port: int, replica_factor: int = VIRTUAL_NODE_REPLICAS,
+                 uid_factory=uuid.uuid4) -> None:
         self.version = 1
-        self.uid = str(uuid.uuid4())
-        self.replica_factor = VIRTUAL_NODE_REPLICAS
+        self.uid_factory = uid_factory  # makes ring uids; a simulator passes a seeded one
+        self.uid = str(uid_factory())
+        self.replica_factor = replica_factor
         self.virtual_nodes = [] # VirtualNode sorted in hash
+        self.ring_hashes = []   # hashes of virtual_nodes, kept in step for bisect
         self.node_map = {}  # physical_node_id -> NodeMeta
+        self.on_change = None   # optional callback(version), run after every version change
         self.add_node(self_host, self_port)
 
     def _sorted_insert(self, vnode: VirtualNode) -> None:
@@ -47,8 +63,9 @@ class RoutingTable:
         Inserts vnode into the virtual_nodes list, sorted by hash
         This is used to maintain the hash ring
         """
-        idx = bisect_right([n.hash for n in self.virtual_nodes], vnode.hash)
+        idx = bisect_right(self.ring_hashes, vnode.hash)
         self.virtual_nodes.insert(idx, vnode)
+        self.ring_hashes.insert(idx, vnode.hash)
 
     def add_node(self, host: str, port: int) -> None:
         """
@@ -61,13 +78,12 @@ class RoutingTable:
             return
 
         self.node_map[node_id] = node
-        for i in range(self.replica_factor):
-            vnode_id = f"{node_id}#{i}"
-            vnode = VirtualNode(vnode_id, node_id)
+        for vnode in _virtual_nodes_for(node_id, self.replica_factor):
             self._sorted_insert(vnode)
 
         self.version += 1
-        self.uid = str(uuid.uuid4())
+        self.uid = str(self.uid_factory())
+        self._changed()
 
     def remove_node(self, host: str, port: int) -> None:
         """
@@ -80,9 +96,15 @@ class RoutingTable:
 
         self.node_map.pop(node_id)
         self.virtual_nodes = [v for v in self.virtual_nodes if v.physical_node_id != node_id]
+        self.ring_hashes = [v.hash for v in self.virtual_nodes]
 
         self.version += 1
-        self.uid = str(uuid.uuid4())
+        self.uid = str(self.uid_factory())
+        self._changed()
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            self.on_change(self.version)
 
     def get_responsible_node(self, key: str) -> NodeMeta:
         """
@@ -91,13 +113,61 @@ class RoutingTable:
         with the virtual node.
         """
         key_hash = hash_str(key)
-        idx = bisect_right([v.hash for v in self.virtual_nodes], key_hash)
+        idx = bisect_right(self.ring_hashes, key_hash)
         if idx == len(self.virtual_nodes):
             idx = 0
         vnode = self.virtual_nodes[idx]
         physical_id = vnode.physical_node_id
         return self.node_map[physical_id]
 
+    def get_successor_nodes(self, key: str, count: int) -> list[NodeMeta]:
+        """
+        Returns up to `count` distinct physical nodes that follow the key's owner
+        clockwise on the ring, excluding the owner itself.
+        """
+        if not self.virtual_nodes:
+            return []
+        key_hash = hash_str(key)
+        start = bisect_right(self.ring_hashes, key_hash)
+        seen = set()
+        result = []
+        for i in range(len(self.virtual_nodes)):
+            physical_id = self.virtual_nodes[(start + i) % len(self.virtual_nodes)].physical_node_id
+            if physical_id in seen:
+                continue
+            seen.add(physical_id)
+            if len(seen) > 1:
+                result.append(self.node_map[physical_id])
+                if len(result) == count:
+                    break
+        return result
+
+    def partition(self, keys: list[str]) -> dict[str, list[int]]:
+        """
+        Groups a batch of keys by responsible physical node in one pass, returning
+        node_id -> positions of that node's keys in `keys`.
+        """
+        hashes = self.ring_hashes
+        vnodes = self.virtual_nodes
+        groups = {}
+        for i, key in enumerate(keys):
+            idx = bisect_right(hashes, hash_str(key))
+            if idx == len(hashes):
+                idx = 0
+            groups.setdefault(vnodes[idx].physical_node_id, []).append(i)
+        return groups
+
+    def without_node(self, node_id: str) -> "RoutingTable":
+        """
+        Returns a copy of the ring with the given physical node taken out, leaving
+        this table untouched. Used to plan where a leaving node's keys will go.
+        """
+        table = copy.copy(self)
+        table.node_map = {k: v for k, v in self.node_map.items() if k != node_id}
+        table.virtual_nodes = [v for v in self.virtual_nodes if v.physical_node_id != node_id]
+        table.ring_hashes = [v.hash for v in table.virtual_nodes]
+        return table
+
     def serialize(self) -> dict:
         """
         Serializes the routing table into a dictionary.
@@ -110,16 +180,38 @@ class RoutingTable:
 
     def replace_with(self, remote_rt: dict) -> None:
         """
-        Replaces the current routing table with a new one by clearing the current
-        routing table and adding the nodes from the new routing table.
+        Replaces the current routing table with a new one. Only the difference is
+        applied: virtual nodes of departed nodes are filtered out in one pass, and
+        those of new nodes are inserted in place when only a few nodes joined, or
+        merged with a single sort otherwise (e.g. on first load).
         """
-        self.node_map.clear()
-        self.virtual_nodes.clear()
+        remote_nodes = {}
         for n in remote_rt.get("nodes", []):
-            self.add_node(n["host"], n["port"])
+            node = NodeMeta(n["host"], n["port"])
+            remote_nodes.setdefault(node.node_id, node)
+        removed = self.node_map.keys() - remote_nodes.keys()
+        added = [node_id for node_id in remote_nodes if node_id not in self.node_map]
+        self.node_map.clear()
+        self.node_map.update(remote_nodes)
+
+        vnodes = self.virtual_nodes
+        if removed:
+            vnodes = [v for v in vnodes if v.physical_node_id not in removed]
+        if len(added) <= 4:
+            self.virtual_nodes = vnodes
+            self.ring_hashes = [v.hash for v in vnodes] if removed else self.ring_hashes
+            for node_id in added:
+                for vnode in _virtual_nodes_for(node_id, self.replica_factor):
+                    self._sorted_insert(vnode)
+        else:
+            vnodes = vnodes + [v for node_id in added for v in _virtual_nodes_for(node_id, self.replica_factor)]
+            vnodes.sort(key=attrgetter("hash"))
+            self.virtual_nodes = vnodes
+            self.ring_hashes = [v.hash for v in vnodes]
 
         self.version = remote_rt["version"]
         self.uid = remote_rt["uid"]
+        self._changed()
 
     def merge_with(self, remote_rt: dict) -> None:
         """
@@ -0,0 +1,449 @@
+import argparse
+import contextlib
+import heapq
+import json
+import os
+import random
+import uuid
+from codec import ZlibCodec
+from data_migrator import DataMigrator
+from expiry import ExpiryManager
+from gossip import GossipManager
+from membership import RingMember, LeaveError
+from routing_table import RoutingTable
+from config import (
+    GOSSIP_INTERVAL,
+    HEARTBEAT_INTERVAL,
+    FAILURE_DETECT_INTERVAL,
+    MIGRATION_INTERVAL,
+    VIRTUAL_NODE_REPLICAS
+)
+
+
+class VirtualClock:
+    """
+    Discrete-event clock. Callbacks run in timestamp order and time jumps
+    straight from one to the next, so simulated minutes take real milliseconds.
+    """
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.queue = []  # (time, seq, callback)
+        self.seq = 0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def schedule(self, delay: float, callback) -> None:
+        heapq.heappush(self.queue, (self.now + delay, self.seq, callback))
+        self.seq += 1
+
+    def run_until(self, until: float) -> None:
+        while self.queue and self.queue[0][0] <= until:
+            when, _, callback = heapq.heappop(self.queue)
+            self.now = when
+            callback()
+        self.now = until
+
+
+class FakeNetwork:
+    """
+    In-process transport between simulated nodes, with per-message latency and
+    jitter, random loss, and partitions. Gossip is delivered asynchronously on
+    the virtual clock; migration requests are synchronous calls that either
+    reach the target or fail.
+    """
+    def __init__(self, clock: VirtualClock, rng: random.Random, latency: float = 0.01,
+                 jitter: float = 0.005, loss: float = 0.0) -> None:
+        self.clock = clock
+        self.rng = rng
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.nodes = {}     # node_id -> SimNode
+        self.groups = None  # node_id -> partition group, None when the network is whole
+        self.gossip_messages = 0
+        self.gossip_bytes = 0
+        self.dropped = 0
+        self.migration_requests = 0
+        self.migration_bytes = 0
+        self.keys_moved = 0
+        self.codec = ZlibCodec()  # sizes gossip as a node with config.py's compression settings sends it
+        self._sized = (None, 0)   # (payload, wire size) of the last gossip payload
+
+    def partition(self, groups: list[list[str]]) -> None:
+        self.groups = {node_id: i for i, group in enumerate(groups) for node_id in group}
+
+    def heal(self) -> None:
+        self.groups = None
+
+    def _reachable(self, src: str, dst: str):
+        node = self.nodes.get(dst)
+        if node is None or not node.running:
+            return None
+        if self.groups is not None and self.groups.get(src) != self.groups.get(dst):
+            return None
+        if self.loss and self.rng.random() < self.loss:
+            return None
+        return node
+
+    def send_gossip(self, src: str, dst: str, payload: dict) -> None:
+        # A sender posts the same payload object to every target, so encode it once
+        if self._sized[0] is not payload:
+            body = json.dumps(payload).encode("utf-8")
+            self._sized = (payload, len(self.codec.compress(body) or body))
+        self.gossip_messages += 1
+        self.gossip_bytes += self._sized[1]
+        node = self._reachable(src, dst)
+        if node is None:
+            self.dropped += 1
+            return
+        delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        self.clock.schedule(delay, lambda: node.running and node.receive_gossip(payload))
+
+    def call(self, src: str, dst: str, size: int):
+        """
+        Returns the target node of a migration request, or None if it was lost.
+        """
+        self.migration_requests += 1
+        self.migration_bytes += size
+        node = self._reachable(src, dst)
+        if node is None:
+            self.dropped += 1
+        return node
+
+
+class SimGossipManager(GossipManager):
+    def __init__(self, network: FakeNetwork, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.network = network
+
+    def _post(self, target: str, payload: dict) -> None:
+        self.network.send_gossip(self.self_node_id, target, payload)
+
+
+class SimMigrator(DataMigrator):
+    def __init__(self, node, network: FakeNetwork) -> None:
+        super().__init__(node)
+        self.network = network
+
+    def _put_key(self, target_id, key, value, ttl, headers):
+        target = self.network.call(self.node.node_id, target_id, len(key) + len(value))
+        if target is None:
+            raise ConnectionError(f"{target_id} unreachable")
+        if not target.is_responsible(key, headers.get("Leaving-Node")):
+            return False, "This node is not responsible for this key"
+        target.storage[key] = value
+        self.network.keys_moved += 1
+        return True, "ok"
+
+    def _put_batch(self, target_id, items, headers):
+        size = sum(len(item["key"]) + len(item["value"]) for item in items)
+        target = self.network.call(self.node.node_id, target_id, size)
+        if target is None:
+            raise ConnectionError(f"{target_id} unreachable")
+        rejected = []
+        for item in items:
+            if target.is_responsible(item["key"], headers.get("Leaving-Node")):
+                target.storage[item["key"]] = item["value"]
+                self.network.keys_moved += 1
+            else:
+                rejected.append(item["key"])
+        return rejected
+
+    def _delete_batch(self, target_id, keys, headers):
+        target = self.network.call(self.node.node_id, target_id, sum(len(key) for key in keys))
+        if target is None:
+            raise ConnectionError(f"{target_id} unreachable")
+        target.revoke_handoff(keys, headers["Leaving-Node"])
+
+
+class SimNode(RingMember):
+    """
+    The parts of node.Node that GossipManager and DataMigrator rely on, driven by
+    the virtual clock instead of background threads. Ownership checks and /leave
+    come from RingMember, the same code node.Node runs.
+    """
+    def __init__(self, index: int, sim: "Simulator") -> None:
+        self.host = f"10.{index // 65536}.{index // 256 % 256}.{index % 256}"
+        self.port = 8000
+        self.node_id = f"{self.host}:{self.port}"
+        self.clock = sim.clock
+        self.rng = random.Random(sim.rng.random())
+        self.storage = {}
+        self.codec = ZlibCodec(enabled=False)
+        self.expiry = ExpiryManager(self.storage, clock=sim.clock)
+        # Ring uids come from the seed too, so gossip payloads (and their sizes) repeat run to run
+        uids = random.Random(sim.rng.random())
+        self.routing_table = RoutingTable(
+            self.host, self.port, replica_factor=sim.vnodes,
+            uid_factory=lambda: uuid.UUID(int=uids.getrandbits(128), version=4)
+        )
+        self.gossip = SimGossipManager(
+            sim.network, self.node_id, self.routing_table,
+            codec=self.codec, clock=sim.clock, rng=self.rng
+        )
+        self.migrator = SimMigrator(self, sim.network)
+        self.handoff_rings = {}
+        self.leaving = False
+        self.left = False
+        self.dirty_keys = set()
+        self.running = False
+
+    def start(self) -> None:
+        self.running = True
+        self._every(HEARTBEAT_INTERVAL, self.gossip.heartbeat_tick)
+        self._every(GOSSIP_INTERVAL, self.gossip.force_gossip_once)
+        self._every(FAILURE_DETECT_INTERVAL, self.gossip.detect_failures)
+        self._every(MIGRATION_INTERVAL, self.migrator._check_and_migrate)
+
+    def _every(self, interval: float, callback) -> None:
+        def tick():
+            if self.running:
+                callback()
+                self.clock.schedule(interval, tick)
+        # Random phase so nodes do not tick in lockstep
+        self.clock.schedule(self.rng.uniform(0, interval), tick)
+
+    def receive_gossip(self, payload: dict) -> None:
+        self.gossip.receive_gossip(payload)
+
+    def _stop_services(self) -> None:
+        self.running = False
+
+    def _pause(self, seconds: float) -> None:
+        pass  # retries cannot wait on the virtual clock from inside an event
+
+
+class Simulator:
+    """
+    Runs a whole cluster of RoutingTable/GossipManager/DataMigrator instances in
+    one process over a FakeNetwork and a VirtualClock. Runs are deterministic
+    for a given seed. Each membership event is followed until every live node
+    holds the same ring, and the report records convergence time, gossip
+    traffic per round, and how many keys moved.
+    """
+    def __init__(self, nodes: int = 100, keys: int = 10000, vnodes: int = VIRTUAL_NODE_REPLICAS,
+                 latency: float = 0.01, jitter: float = 0.005, loss: float = 0.0,
+                 seed: int = 0, value_size: int = 100, max_settle: float = 300.0) -> None:
+        self.rng = random.Random(seed)
+        self.clock = VirtualClock()
+        self.network = FakeNetwork(self.clock, self.rng, latency, jitter, loss)
+        self.vnodes = vnodes
+        self.value_size = value_size
+        self.max_settle = max_settle
+        self.nodes = {}    # node_id -> SimNode, including stopped ones
+        self.members = []  # node ids that should be in the ring
+        self.keys = [f"key{i}" for i in range(keys)]
+        self.next_index = 0
+        self.reports = []
+        self._bootstrap(nodes)
+
+    def _new_node(self) -> SimNode:
+        node = SimNode(self.next_index, self)
+        self.next_index += 1
+        self.nodes[node.node_id] = node
+        self.network.nodes[node.node_id] = node
+        return node
+
+    def _bootstrap(self, count: int) -> None:
+        """
+        Starts `count` nodes that already share one ring and hold their keys.
+        """
+        nodes = [self._new_node() for _ in range(count)]
+        template = nodes[0].routing_table
+        template.replace_with({
+            "version": 2,
+            "uid": "bootstrap",
+            "nodes": [{"host": n.host, "port": n.port} for n in nodes]
+        })
+        for node in nodes[1:]:
+            rt = node.routing_table
+            rt.node_map = dict(template.node_map)
+            rt.virtual_nodes = list(template.virtual_nodes)
+            rt.ring_hashes = list(template.ring_hashes)
+            rt.version, rt.uid = template.version, template.uid
+        value = "x" * self.value_size
+        for node_id, idxs in template.partition(self.keys).items():
+            storage = self.nodes[node_id].storage
+            for i in idxs:
+                storage[self.keys[i]] = value
+        for node in nodes:
+            node.migrator.last_version = node.routing_table.version
+            node.start()
+            self.members.append(node.node_id)
+
+    def _live(self) -> list[SimNode]:
+        return [self.nodes[m] for m in self.members]
+
+    def converged(self) -> bool:
+        """
+        True once every live node routes with exactly the expected members. Nodes
+        that removed the same dead peer independently agree on membership but
+        keep different uids, so uids are reported separately rather than required.
+        """
+        expected = set(self.members)
+        return all(node.routing_table.node_map.keys() == expected for node in self._live())
+
+    def _views(self) -> int:
+        return len({(n.routing_table.version, n.routing_table.uid) for n in self._live()})
+
+    def _snapshot(self) -> tuple:
+        net = self.network
+        counters = (net.gossip_messages, net.gossip_bytes, net.dropped, net.keys_moved, net.migration_bytes)
+        return self._owners(self.members), counters
+
+    def _owners(self, members: list[str]) -> dict:
+        """
+        Maps every key to its owner on the ring that holds exactly `members`.
+        """
+        ring = RoutingTable("simulator", 0, replica_factor=self.vnodes)
+        ring.replace_with({
+            "version": 0,
+            "uid": "expected",
+            "nodes": [{"host": self.nodes[m].host, "port": self.nodes[m].port} for m in members]
+        })
+        groups = ring.partition(self.keys)
+        return {self.keys[i]: node_id for node_id, idxs in groups.items() for i in idxs}
+
+    def run(self, seconds: float) -> None:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            self.clock.run_until(self.clock.now + seconds)
+
+    def _settle(self, event: str, node_id: str, before: tuple) -> dict:
+        """
+        Runs until the ring has converged and migrations had time to finish,
+        then records what the event cost since `before` (from _snapshot).
+        """
+        net = self.network
+        owners_before, base = before
+        start = self.clock.now
+        converged_at = None
+        while self.clock.now - start < self.max_settle:
+            self.run(GOSSIP_INTERVAL / 4)
+            if converged_at is None and self.converged():
+                converged_at = self.clock.now
+            if converged_at is not None and self.clock.now >= converged_at + 2 * MIGRATION_INTERVAL:
+                break
+
+        rounds = max(1.0, (self.clock.now - start) / GOSSIP_INTERVAL)
+        owners_after = self._owners(self.members)
+        placed = misplaced = 0
+        for key, owner in owners_after.items():
+            if key in self.nodes[owner].storage:
+                placed += 1
+            elif any(key in n.storage for n in self._live()):
+                misplaced += 1
+        report = {
+            "event": event,
+            "node": node_id,
+            "nodes": len(self.members),
+            "converged": converged_at is not None,
+            "convergence_seconds": round(converged_at - start, 2) if converged_at is not None else None,
+            "views": self._views(),
+            "messages_per_round": round((net.gossip_messages - base[0]) / rounds, 1),
+            "bytes_per_round": round((net.gossip_bytes - base[1]) / rounds),
+            "dropped": net.dropped - base[2],
+            "keys_moved": net.keys_moved - base[3],
+            "migration_bytes": net.migration_bytes - base[4],
+            "keys_reassigned": sum(1 for k in self.keys if owners_before.get(k) != owners_after[k]),
+            "misplaced": misplaced,
+            "lost": len(self.keys) - placed - misplaced,
+        }
+        self.reports.append(report)
+        return report
+
+    def join(self) -> dict:
+        """
+        Starts a new node and joins it through a random member, as /join does.
+        """
+        before = self._snapshot()
+        node = self._new_node()
+        node.start()
+        contact = self.nodes[self.rng.choice(self.members)]
+        self.members.append(node.node_id)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            contact.routing_table.add_node(node.host, node.port)
+            contact.gossip.force_gossip_once()
+        return self._settle("join", node.node_id, before)
+
+    def leave(self) -> dict:
+        """
+        Gracefully decommissions a random member, as /leave does.
+        """
+        before = self._snapshot()
+        node = self.nodes[self.rng.choice(self.members)]
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            try:
+                node.leave()
+            except LeaveError:
+                pass
+        if node.left:
+            self.members.remove(node.node_id)
+        return self._settle("leave" if node.left else "leave-aborted", node.node_id, before)
+
+    def crash(self) -> dict:
+        """
+        Stops a random member without warning; the failure detector has to notice.
+        """
+        before = self._snapshot()
+        node = self.nodes[self.rng.choice(self.members)]
+        node.running = False
+        self.members.remove(node.node_id)
+        return self._settle("crash", node.node_id, before)
+
+    def partition(self, seconds: float) -> dict:
+        """
+        Splits the members into two halves for `seconds`, then heals the network.
+        """
+        before = self._snapshot()
+        members = list(self.members)
+        self.rng.shuffle(members)
+        half = len(members) // 2
+        self.network.partition([members[:half], members[half:]])
+        self.run(seconds)
+        self.network.heal()
+        return self._settle(f"partition {seconds:g}s", "-", before)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate gossip convergence and rebalancing in one process.")
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--vnodes", type=int, default=VIRTUAL_NODE_REPLICAS,
+                        help="virtual nodes per node; memory grows with nodes^2 * vnodes, so lower this for 500+ nodes")
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--joins", type=int, default=1)
+    parser.add_argument("--leaves", type=int, default=1)
+    parser.add_argument("--crashes", type=int, default=0)
+    parser.add_argument("--partition", type=float, default=0, help="seconds of a half/half partition (0 = none)")
+    parser.add_argument("--latency", type=float, default=0.01, help="mean one-way latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--loss", type=float, default=0.0, help="probability a message is dropped")
+    parser.add_argument("--warmup", type=float, default=30.0, help="seconds to run before the first event")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print reports as JSON")
+    args = parser.parse_args()
+
+    sim = Simulator(args.nodes, args.keys, args.vnodes, args.latency, args.jitter, args.loss, args.seed)
+    sim.run(args.warmup)
+    for _ in range(args.joins):
+        sim.join()
+    for _ in range(args.leaves):
+        sim.leave()
+    for _ in range(args.crashes):
+        sim.crash()
+    if args.partition:
+        sim.partition(args.partition)
+
+    if args.json:
+        print(json.dumps(sim.reports, indent=2))
+        return
+    print(f"{'event':<16}{'nodes':>6}{'conv(s)':>9}{'views':>7}{'msgs/rnd':>10}{'bytes/rnd':>12}"
+          f"{'moved':>8}{'reassigned':>12}{'misplaced':>11}{'lost':>7}")
+    for r in sim.reports:
+        conv = r["convergence_seconds"] if r["converged"] else "never"
+        print(f"{r['event']:<16}{r['nodes']:>6}{conv:>9}{r['views']:>7}{r['messages_per_round']:>10}{r['bytes_per_round']:>12}"
+              f"{r['keys_moved']:>8}{r['keys_reassigned']:>12}{r['misplaced']:>11}{r['lost']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from bulk_loader import parse_record, read_chunks, Checkpoint, BulkLoader
+from routing_table import RoutingTable
+
+
+class FakeCluster:
+    """
+    Serves /routing_table and /kv/batch for a bulk loader. The loader bootstraps
+    from the old ring, but the nodes already follow the new one and reject keys
+    they no longer own.
+    """
+    def __init__(self, old_ring, new_ring):
+        self.rings = [old_ring.serialize(), new_ring.serialize()]
+        self.new_ring = new_ring
+        self.stored = {}    # key -> node id it was stored on
+        self.rejected = 0
+        self.inflight = {}
+        self.max_inflight = {}
+        self.lock = threading.Lock()
+
+    def get(self, url, timeout):
+        # Bootstrap gets the old ring; every later refresh sees the new one
+        ring = self.rings[0] if not self.stored and not self.rejected else self.rings[1]
+        return mock.Mock(json=lambda: ring)
+
+    def put(self, url, data, headers, timeout):
+        node_id = url.split("/")[2]
+        with self.lock:
+            self.inflight[node_id] = self.inflight.get(node_id, 0) + 1
+            self.max_inflight[node_id] = max(self.max_inflight.get(node_id, 0), self.inflight[node_id])
+        time.sleep(0.005)
+        stored, rejected = 0, []
+        for item in json.loads(data)["items"]:
+            if self.new_ring.get_responsible_node(item["key"]).node_id == node_id:
+                with self.lock:
+                    self.stored[item["key"]] = node_id
+                stored += 1
+            else:
+                rejected.append(item["key"])
+        with self.lock:
+            self.inflight[node_id] -= 1
+            self.rejected += len(rejected)
+        result = {"status": "ok", "stored": stored, "rejected": rejected}
+        return mock.Mock(headers={}, json=lambda: result, raise_for_status=lambda: None)
+
+class TestBulkLoader(unittest.TestCase):
+    def setUp(self):
+        """Set up a scratch directory for input and checkpoint files"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.tmp.name, "data.jsonl")
+        with open(self.input, "w") as f:
+            for i in range(10):
+                f.write(json.dumps({"key": f"k{i}", "value": f"v{i}"}) + "\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parse_record(self):
+        """Test parsing JSONL and CSV lines, including TTLs and headers"""
+        self.assertEqual(parse_record(b'{"key": "a", "value": 1, "ttl": 5}\n', "jsonl"),
+                         {"key": "a", "value": "1", "ttl": 5.0})
+        self.assertEqual(parse_record(b'{"key": "a", "value": {"x": [1, true, null]}}', "jsonl")["value"],
+                         '{"x": [1, true, null]}')
+        self.assertEqual(parse_record(b'{"key": "a", "value": null}', "jsonl")["value"], "null")
+        self.assertEqual(parse_record(b'{"key": "a", "value": "plain"}', "jsonl")["value"], "plain")
+        self.assertEqual(parse_record(b'a,"x, y"\r\n', "csv"), {"key": "a", "value": "x, y"})
+        self.assertIsNone(parse_record(b"key,value,ttl\n", "csv"))
+        self.assertIsNone(parse_record(b"\n", "jsonl"))
+
+    def test_read_chunks_resumes_from_offset(self):
+        """Test that chunk offsets can be used to resume reading"""
+        chunks = list(read_chunks(self.input, "jsonl", chunk_size=4))
+        self.assertEqual([len(items) for items, _ in chunks], [4, 4, 2])
+
+        rest = list(read_chunks(self.input, "jsonl", offset=chunks[0][1], chunk_size=4))
+        self.assertEqual(rest[0][0][0]["key"], "k4")
+        self.assertEqual(sum(len(items) for items, _ in rest), 6)
+
+    def test_checkpoint_commits_contiguous_prefix(self):
+        """Test that a chunk finishing early is not saved until earlier chunks finish"""
+        path = os.path.join(self.tmp.name, "progress")
+        checkpoint = Checkpoint(path, self.input)
+        checkpoint.complete(1, 200, 4)
+        self.assertEqual(checkpoint.records, 0)
+        self.assertFalse(os.path.exists(path))
+
+        checkpoint.complete(0, 100, 4)
+        self.assertEqual((checkpoint.offset, checkpoint.records), (200, 8))
+
+        resumed = Checkpoint(path, self.input)
+        self.assertEqual((resumed.offset, resumed.records), (200, 8))
+
+        # Progress for a different input file is ignored
+        other = Checkpoint(path, os.path.join(self.tmp.name, "other.jsonl"))
+        self.assertEqual((other.offset, other.records), (0, 0))
+
+    def test_checkpoint_ignored_when_input_changes(self):
+        """Test that progress saved for a file is dropped once the file is rewritten"""
+        path = os.path.join(self.tmp.name, "progress")
+        Checkpoint(path, self.input).complete(0, 100, 4)
+        with open(self.input, "a") as f:
+            f.write(json.dumps({"key": "k10", "value": "v10"}) + "\n")
+        resumed = Checkpoint(path, self.input)
+        self.assertEqual((resumed.offset, resumed.records), (0, 0))
+
+    def test_finished_load_removes_checkpoint(self):
+        """Test that a completed load leaves nothing to resume from"""
+        path = os.path.join(self.tmp.name, "progress")
+        checkpoint = Checkpoint(path, self.input)
+        checkpoint.complete(0, 100, 4)
+        checkpoint.finish()
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(Checkpoint(path, self.input).records, 0)
+
+    def test_partition_groups_keys_by_owner(self):
+        """Test that each chunk is split into batches for the node owning its keys"""
+        ring = RoutingTable("10.0.0.1", 8000)
+        ring.add_node("10.0.0.2", 8000)
+        with mock.patch("bulk_loader.requests.get", return_value=mock.Mock(json=ring.serialize)):
+            loader = BulkLoader("10.0.0.1:8000", batch_size=3)
+        items = [{"key": f"k{i}", "value": "v"} for i in range(20)]
+        batches = loader._partition(items)
+        self.assertTrue(all(len(batch) <= 3 for _, batch in batches))
+        self.assertEqual(sorted(item["key"] for _, batch in batches for item in batch), sorted(i["key"] for i in items))
+        for node_id, batch in batches:
+            for item in batch:
+                self.assertEqual(ring.get_responsible_node(item["key"]).node_id, node_id)
+
+    def test_load_reroutes_keys_rejected_after_ring_change(self):
+        """Test a full load where nodes reject keys that moved to a new node"""
+        old_ring = RoutingTable("10.0.0.1", 8000)
+        old_ring.add_node("10.0.0.2", 8000)
+        new_ring = RoutingTable("10.0.0.1", 8000)
+        new_ring.add_node("10.0.0.2", 8000)
+        new_ring.add_node("10.0.0.3", 8000)
+        new_ring.version = old_ring.version + 1
+        cluster = FakeCluster(old_ring, new_ring)
+        path = os.path.join(self.tmp.name, "many.jsonl")
+        with open(path, "w") as f:
+            for i in range(300):
+                f.write(json.dumps({"key": f"key{i}", "value": i}) + "\n")
+        checkpoint = os.path.join(self.tmp.name, "progress")
+
+        session = mock.Mock(put=cluster.put)
+        with mock.patch("bulk_loader.requests.get", side_effect=cluster.get), \
+                mock.patch.object(BulkLoader, "_session", return_value=session):
+            loader = BulkLoader("10.0.0.1:8000", batch_size=10, chunk_size=50, concurrency=2)
+            report = loader.load(path, "jsonl", checkpoint)
+
+        self.assertGreater(cluster.rejected, 0)
+        self.assertEqual(len(cluster.stored), 300)
+        for key, node_id in cluster.stored.items():
+            self.assertEqual(new_ring.get_responsible_node(key).node_id, node_id)
+        self.assertEqual((report["records"], report["total_records"]), (300, 300))
+        self.assertEqual(sum(report["per_node"].values()), 300)
+        self.assertIn("10.0.0.3:8000", report["per_node"])
+        self.assertTrue(all(n <= 2 for n in cluster.max_inflight.values()))
+        self.assertFalse(os.path.exists(checkpoint))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,7 @@
 import pytest
+import requests
+from unittest import mock
+import client as client_module
 from client import SmartClient
 from routing_table import RoutingTable
 
@@ -17,3 +20,118 @@ def test_client_put_get_refresh(client):
     client.routing_table.version -= 1  # force stale
     client.refresh()  # should fetch new routing table
     assert client.routing_table.version == client.routing_table.version
+
+RING = {
+    "version": 5,
+    "uid": "ring",
+    "nodes": [{"node_id": f"10.0.0.{i}:8000", "host": f"10.0.0.{i}", "port": 8000} for i in range(1, 4)],
+}
+
+def _resp(payload, status_code=200, headers=None):
+    return mock.Mock(status_code=status_code, json=lambda: payload, headers=headers or {})
+
+def make_client(monkeypatch, ring=RING):
+    # Bootstrap from a canned routing table, without the background watch
+    monkeypatch.setattr(client_module.requests, "get", lambda url, **kwargs: _resp(ring))
+    return SmartClient(watch=False)
+
+def test_get_falls_back_to_owner_when_replica_is_down(monkeypatch):
+    smart = make_client(monkeypatch)
+    smart.hot_replicas["k"] = ["10.0.0.9:8000"]
+    monkeypatch.setattr(client_module.random, "choice", lambda seq: seq[-1])  # always pick the replica
+
+    def get(url, params=None, headers=None, **kwargs):
+        if "10.0.0.9" in url:
+            raise requests.ConnectionError("replica down")
+        return _resp({"key": "k", "value": "v"})
+
+    monkeypatch.setattr(client_module.requests, "get", get)
+    assert smart.get("k")["value"] == "v"
+    assert "k" not in smart.hot_replicas
+
+def test_scan_merges_nodes_in_order_and_dedups(monkeypatch):
+    smart = make_client(monkeypatch)
+    # Node 1 still holds a copy of "b" that is mid-migration to node 2
+    pages = {
+        ("10.0.0.1:8000", None): ([("a", 1), ("b", 2)], "c1"),
+        ("10.0.0.1:8000", "c1"): ([("e", 5)], None),
+        ("10.0.0.2:8000", None): ([("b", 2), ("d", 4)], None),
+        ("10.0.0.3:8000", None): ([("c", 3)], None),
+    }
+    monkeypatch.setattr(smart, "_fetch_scan_page",
+                        lambda node, prefix, cursor, page_size: pages[(node.node_id, cursor)])
+    assert list(smart.scan()) == [("a", 1), ("b", 2), ("c", 3), ("d", 4), ("e", 5)]
+
+def test_put_refreshes_ring_and_retries_on_403(monkeypatch):
+    smart = make_client(monkeypatch)
+    owner = smart.routing_table.get_responsible_node("k").node_id
+    # Version 6 moves every key to the one remaining node
+    new_owner = next(n for n in RING["nodes"] if n["node_id"] != owner)
+    moved = {"version": 6, "uid": "moved", "nodes": [new_owner]}
+    monkeypatch.setattr(client_module.requests, "get", lambda url, **kwargs: _resp(moved))
+    calls = []
+
+    def put(url, **kwargs):
+        calls.append(url)
+        if owner in url:
+            return _resp({"detail": "not responsible"}, status_code=403)
+        return _resp({"status": "ok"})
+
+    monkeypatch.setattr(client_module.requests, "put", put)
+    assert smart.put("k", "v") == {"status": "ok"}
+    assert calls == [f"http://{owner}/kv", f"http://{new_owner['node_id']}/kv"]
+    assert smart.version == 6
+
+def test_watch_repicks_target_once_it_leaves_the_ring(monkeypatch):
+    smart = make_client(monkeypatch)
+    monkeypatch.setattr(client_module.random, "choice", lambda seq: seq[0])
+    watched = list(smart.routing_table.node_map)[0]
+    without = {"version": 6, "uid": "left", "nodes": [n for n in RING["nodes"] if n["node_id"] != watched]}
+    hosts = []
+
+    def get(url, params=None, **kwargs):
+        hosts.append(url.split("/")[2])
+        if len(hosts) == 2:
+            smart.watching = False
+        return _resp(without)
+
+    monkeypatch.setattr(client_module.requests, "get", get)
+    smart.watching = True
+    smart._watch_loop()
+    assert hosts[0] == watched
+    assert hosts[1] != watched
+
+def _capture_put(monkeypatch, calls):
+    def put(url, params=None, data=None, **kwargs):
+        calls.append((url, params, [bytes(c) for c in data]))
+        return _resp({"status": "ok", "size": sum(len(c) for c in calls[-1][2])})
+    monkeypatch.setattr(client_module.requests, "put", put)
+
+def test_put_stream_sends_bytes_files_and_iterables_in_chunks(monkeypatch, tmp_path):
+    smart = make_client(monkeypatch)
+    calls = []
+    _capture_put(monkeypatch, calls)
+    value = bytes(range(256)) * 40
+    path = tmp_path / "blob.bin"
+    path.write_bytes(value)
+
+    assert smart.put_stream("blob", value, chunk_size=4096)["size"] == len(value)
+    with open(path, "rb") as f:
+        smart.put_stream("blob", f, ttl=30, chunk_size=4096)
+    smart.put_stream("blob", iter([value[:10], value[10:]]))
+
+    owner = smart.routing_table.get_responsible_node("blob").node_id
+    for url, params, chunks in calls:
+        assert url == f"http://{owner}/kv/stream"
+        assert b"".join(chunks) == value
+    assert [len(c) for c in calls[0][2]] == [4096, 4096, 2048]
+    assert calls[1][1] == {"key": "blob", "ttl": 30}
+
+def test_get_stream_yields_raw_chunks(monkeypatch):
+    smart = make_client(monkeypatch)
+    resp = mock.MagicMock()
+    resp.__enter__.return_value = resp
+    resp.iter_content.return_value = iter([b"\x00\x01", b"\xff"])
+    monkeypatch.setattr(client_module.requests, "get", lambda url, **kwargs: resp)
+    assert b"".join(smart.get_stream("blob")) == b"\x00\x01\xff"
+    resp.raise_for_status.assert_called_once()
@@ -0,0 +1,107 @@
+import os
+import unittest
+import zlib
+from codec import ZlibCodec, CompressedValue, BoundedInflater, InflateLimitExceeded, accepts_coding
+
+class TestZlibCodec(unittest.TestCase):
+    def setUp(self):
+        """Set up a codec with a small threshold before each test"""
+        self.codec = ZlibCodec(threshold=64)
+
+    def test_small_values_stored_raw(self):
+        """Test that values below the threshold are left untouched"""
+        self.assertEqual(self.codec.encode_value("short"), "short")
+        self.assertEqual(self.codec.stats.to_dict()["compressed"], 0)
+
+    def test_text_round_trip(self):
+        """Test that a large string is compressed and restored"""
+        value = "abc" * 1000
+        stored = self.codec.encode_value(value)
+        self.assertIsInstance(stored, CompressedValue)
+        self.assertLess(len(stored.data), len(value))
+        self.assertEqual(self.codec.decode_value(stored), value)
+
+    def test_binary_round_trip(self):
+        """Test that binary values come back as a memoryview of the same bytes"""
+        value = memoryview(b"\x00\x01" * 1000)
+        stored = self.codec.encode_value(value)
+        decoded = self.codec.decode_value(stored)
+        self.assertIsInstance(decoded, memoryview)
+        self.assertEqual(bytes(decoded), bytes(value))
+
+    def test_incompressible_values_skipped(self):
+        """Test that data which does not shrink is kept raw and counted as skipped"""
+        value = os.urandom(1000)
+        self.assertIsNone(self.codec.compress(value))
+        self.assertEqual(self.codec.stats.to_dict()["skipped"], 1)
+
+    def test_iter_decompress(self):
+        """Test that chunked decompression yields the original bytes in bounded chunks"""
+        raw = b"0123456789" * 5000
+        chunks = list(self.codec.iter_decompress(zlib.compress(raw), 1024))
+        self.assertEqual(b"".join(chunks), raw)
+        self.assertTrue(all(len(c) <= 1024 for c in chunks))
+
+    def test_peer_negotiation(self):
+        """Test that only peers advertising the coding receive compressed bodies"""
+        payload = {"value": "x" * 1000}
+        body, headers = self.codec.encode_json("127.0.0.1:8001", payload)
+        self.assertNotIn("Content-Encoding", headers)
+
+        self.codec.note_peer("127.0.0.1:8001", {"Accept-Encoding": "deflate"})
+        body, headers = self.codec.encode_json("127.0.0.1:8001", payload)
+        self.assertEqual(headers["Content-Encoding"], "deflate")
+        self.assertIn(b"xxxx", zlib.decompress(body))
+
+        self.codec.note_peer("127.0.0.1:8001", {})
+        body, headers = self.codec.encode_json("127.0.0.1:8001", payload)
+        self.assertNotIn("Content-Encoding", headers)
+
+    def test_peer_refusing_coding_gets_plain_bodies(self):
+        """Test that a coding listed with q=0 is not treated as accepted"""
+        self.codec.note_peer("127.0.0.1:8001", {"Accept-Encoding": "gzip, deflate;q=0"})
+        body, headers = self.codec.encode_json("127.0.0.1:8001", {"value": "x" * 1000})
+        self.assertNotIn("Content-Encoding", headers)
+
+    def test_accepts_coding(self):
+        """Test Accept-Encoding parsing: whole tokens, q-values and the wildcard"""
+        self.assertTrue(accepts_coding("deflate", "deflate"))
+        self.assertTrue(accepts_coding("gzip, Deflate;q=0.5", "deflate"))
+        self.assertTrue(accepts_coding("*", "deflate"))
+        self.assertFalse(accepts_coding("", "deflate"))
+        self.assertFalse(accepts_coding("deflate;q=0", "deflate"))
+        self.assertFalse(accepts_coding("deflate; q=0.0, *", "deflate"))
+        self.assertFalse(accepts_coding("x-deflate-ish", "deflate"))
+        self.assertFalse(accepts_coding("gzip, *;q=0", "deflate"))
+
+    def test_decompress_size_cap(self):
+        """Test that inflating past max_size is refused instead of buffered"""
+        bomb = zlib.compress(b"\0" * 1_000_000)
+        self.assertEqual(len(self.codec.decompress(bomb, max_size=1_000_000)), 1_000_000)
+        with self.assertRaises(InflateLimitExceeded):
+            self.codec.decompress(bomb, max_size=1000)
+
+    def test_bounded_inflater_counts_across_pieces(self):
+        """Test that the cap applies to the total of a stream fed in pieces"""
+        data = zlib.compress(b"a" * 10000)
+        inflater = BoundedInflater(8000)
+        with self.assertRaises(InflateLimitExceeded):
+            for i in range(0, len(data), 10):
+                inflater.feed(data[i:i + 10])
+
+    def test_decompress_rejects_bad_data(self):
+        """Test that corrupt and truncated streams raise zlib.error"""
+        with self.assertRaises(zlib.error):
+            self.codec.decompress(b"not zlib at all", max_size=1000)
+        with self.assertRaises(zlib.error):
+            self.codec.decompress(zlib.compress(b"abc" * 1000)[:-8], max_size=10000)
+
+    def test_stats_ratio(self):
+        """Test that the reported ratio reflects bytes saved"""
+        self.codec.encode_value("a" * 10000)
+        stats = self.codec.stats.to_dict()
+        self.assertEqual(stats["raw_bytes"], 10000)
+        self.assertGreater(stats["ratio"], 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
 import pytest
+from types import SimpleNamespace
 from routing_table import RoutingTable
 from data_migrator import DataMigrator
+from expiry import ExpiryManager
+from codec import ZlibCodec
 import threading
 
 class DummyRoutingTable(RoutingTable):
@@ -35,3 +38,64 @@ def test_data_migrator_triggers_on_version_change(monkeypatch):
 
     # Verify that migration occurred: no exceptions and thread is alive
     assert t.is_alive()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_migrator(clock):
+    # A two-node ring: keys owned by 10.0.0.2 must move off this node
+    storage = {}
+    rt = RoutingTable("10.0.0.1", 8000)
+    rt.add_node("10.0.0.2", 8000)
+    node = SimpleNamespace(node_id="10.0.0.1:8000", storage=storage, routing_table=rt,
+                           expiry=ExpiryManager(storage, clock=clock), codec=ZlibCodec(enabled=False))
+    return DataMigrator(node), node
+
+
+def record_put_key(sent):
+    def put_key(target, key, value, ttl, headers):
+        sent[key] = ttl
+        return True, ""
+    return put_key
+
+
+def test_migrated_keys_keep_remaining_ttl():
+    clock = FakeClock()
+    dm, node = make_migrator(clock)
+    moving = [k for k in (f"k{i}" for i in range(50)) if node.routing_table.get_responsible_node(k).node_id != node.node_id]
+    for key in moving[:2]:
+        node.storage[key] = "v"
+    node.expiry.set(moving[0], 100)
+    clock.now += 40
+    sent = {}
+    dm._put_key = record_put_key(sent)
+
+    dm._migrate_data()
+    assert sent == {moving[0]: 60, moving[1]: None}
+    assert node.storage == {}
+
+
+def test_handoff_sends_remaining_ttl():
+    clock = FakeClock()
+    dm, node = make_migrator(clock)
+    node.storage.update({"text": "v", "blob": memoryview(b"\xff\x00"), "forever": "v"})
+    node.expiry.set("text", 30)
+    node.expiry.set("blob", 20)
+    clock.now += 10
+    sent = {}
+
+    def put_batch(target, items, headers):
+        sent.update((item["key"], item["ttl"]) for item in items)
+        return []
+
+    dm._put_batch = put_batch
+    dm._put_key = record_put_key(sent)
+    count, failed = dm.handoff(node.routing_table.without_node(node.node_id))
+    assert (count, failed) == (3, [])
+    assert sent == {"text": 20, "blob": 10, "forever": None}
@@ -0,0 +1,76 @@
+import unittest
+from expiry import ExpiryManager
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestExpiryManager(unittest.TestCase):
+    def setUp(self):
+        """Set up storage with a controllable clock before each test"""
+        self.clock = FakeClock()
+        self.storage = {}
+        self.expiry = ExpiryManager(self.storage, clock=self.clock)
+
+    def put(self, key, value, ttl=None):
+        self.storage[key] = value
+        self.expiry.set(key, ttl)
+
+    def test_expire_due_removes_only_due_keys(self):
+        """Test that a sweep removes expired keys and leaves the rest"""
+        self.put("a", "1", ttl=5)
+        self.put("b", "2", ttl=20)
+        self.put("c", "3")
+        self.clock.now += 10
+        self.assertEqual(self.expiry.expire_due(), ["a"])
+        self.assertEqual(set(self.storage), {"b", "c"})
+
+    def test_lazy_expiry_on_access(self):
+        """Test that an expired key is removed when it is accessed"""
+        self.put("a", "1", ttl=5)
+        self.assertFalse(self.expiry.expire_if_due("a"))
+        self.clock.now += 5
+        self.assertTrue(self.expiry.expire_if_due("a"))
+        self.assertNotIn("a", self.storage)
+
+    def test_overwrite_replaces_deadline(self):
+        """Test that rewriting a key discards its old deadline"""
+        self.put("a", "1", ttl=5)
+        self.put("a", "2", ttl=50)
+        self.clock.now += 10
+        self.assertEqual(self.expiry.expire_due(), [])
+        self.assertEqual(self.storage["a"], "2")
+
+        self.put("a", "3")
+        self.clock.now += 100
+        self.assertEqual(self.expiry.expire_due(), [])
+        self.assertIsNone(self.expiry.remaining("a"))
+
+    def test_remaining(self):
+        """Test that the remaining lifetime counts down with the clock"""
+        self.put("a", "1", ttl=30)
+        self.clock.now += 12
+        self.assertAlmostEqual(self.expiry.remaining("a"), 18)
+
+    def test_heap_compaction(self):
+        """Test that repeated rewrites do not grow the heap without bound"""
+        for i in range(1000):
+            self.put("a", str(i), ttl=10 + i)
+        self.assertLess(len(self.expiry.heap), 100)
+        self.clock.now += 2000
+        self.assertEqual(self.expiry.expire_due(), ["a"])
+
+    def test_non_finite_ttl_rejected(self):
+        """Test that NaN and infinite TTLs are refused instead of wedging the heap"""
+        self.put("a", "1", ttl=5)
+        for ttl in (float("nan"), float("inf")):
+            with self.assertRaises(ValueError):
+                self.expiry.set("b", ttl)
+        self.clock.now += 10
+        self.assertEqual(self.expiry.expire_due(), ["a"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from codec import ZlibCodec
+from expiry import ExpiryManager
+from hotkeys import CountMinSketch, HotKeyTracker
+from hot_key_replicator import HotKeyReplicator
+from routing_table import NodeMeta
+
+class TestCountMinSketch(unittest.TestCase):
+    def test_estimate_never_undercounts(self):
+        """Test that estimates are at least the true counts"""
+        cms = CountMinSketch(width=64, depth=4)
+        for i in range(200):
+            cms.add(f"key{i % 50}")
+        for i in range(50):
+            self.assertGreaterEqual(cms.estimate(f"key{i}"), 4)
+
+    def test_decay_halves_counts(self):
+        """Test that decay halves every counter"""
+        cms = CountMinSketch()
+        cms.add("k", 10)
+        cms.decay()
+        self.assertEqual(cms.estimate("k"), 5)
+
+class TestHotKeyTracker(unittest.TestCase):
+    def setUp(self):
+        """Set up a tracker that keeps the top 3 keys"""
+        self.tracker = HotKeyTracker(k=3)
+
+    def test_top_k_keeps_heaviest(self):
+        """Test that the heaviest keys displace colder ones from the top-k"""
+        for i in range(10):
+            self.tracker.record_read(f"cold{i}")
+        for _ in range(100):
+            self.tracker.record_read("hot")
+        for _ in range(50):
+            self.tracker.record_read("warm")
+        keys = [h["key"] for h in self.tracker.hot_keys()]
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(keys[:2], ["hot", "warm"])
+
+    def test_read_mostly(self):
+        """Test that write-heavy keys are not considered for replication"""
+        for _ in range(100):
+            self.tracker.record_read("reads")
+            self.tracker.record_read("mixed")
+            self.tracker.record_write("mixed")
+        self.assertEqual(self.tracker.read_mostly(50, 0.1), ["reads"])
+
+    def test_decay_forgets_cold_keys(self):
+        """Test that keys drop out of the top-k once their counts decay to zero"""
+        self.tracker.record_read("once")
+        self.tracker.decay()
+        self.assertEqual(self.tracker.hot_keys(), [])
+
+class TestHotKeyReplicator(unittest.TestCase):
+    def setUp(self):
+        """Set up a replicator on a stub node whose hot key has one successor"""
+        storage = {"hot": "v1"}
+        self.node = SimpleNamespace(
+            storage=storage,
+            expiry=ExpiryManager(storage),
+            codec=ZlibCodec(enabled=False),
+            routing_table=SimpleNamespace(get_successor_nodes=lambda key, count: [NodeMeta("10.0.0.2", 8000)])
+        )
+        self.replicator = HotKeyReplicator(self.node)
+        self.deleted = []
+
+    def _delete(self, url, params, timeout):
+        self.deleted.append(params)
+        return mock.Mock(status_code=200)
+
+    def test_stale_push_refused_after_drop(self):
+        """Test that a replica refuses a push older than an invalidation it has seen"""
+        self.assertTrue(self.replicator.store_replica("k", "old", 10, version=1))
+        self.replicator.drop_replica("k", version=2)
+        self.assertFalse(self.replicator.store_replica("k", "old", 10, version=1))
+        self.assertIsNone(self.replicator.get_replica("k"))
+        self.assertTrue(self.replicator.store_replica("k", "new", 10, version=3))
+        self.assertEqual(self.replicator.get_replica("k"), "new")
+
+    def test_invalidate_is_synchronous(self):
+        """Test that replicas are dropped before invalidate returns"""
+        self.replicator.replicated["hot"] = ["10.0.0.2:8000"]
+        with mock.patch("hot_key_replicator.requests.delete", side_effect=self._delete):
+            self.replicator.invalidate("hot")
+        self.assertEqual([p["key"] for p in self.deleted], ["hot"])
+        self.assertIsNone(self.replicator.replicas_of("hot"))
+
+    def test_unreachable_replica_is_waited_out(self):
+        """Test that a write waits for the lease of a replica it could not invalidate"""
+        self.replicator.replicated["hot"] = ["10.0.0.2:8000"]
+        self.replicator.leases["hot"] = time.monotonic() + 5
+        with mock.patch("hot_key_replicator.requests.delete", side_effect=ConnectionError), \
+                mock.patch("hot_key_replicator.time.sleep") as sleep:
+            self.replicator.invalidate("hot")
+        self.assertAlmostEqual(sleep.call_args[0][0], 5, delta=0.5)
+
+    def test_second_write_waits_for_slow_invalidation(self):
+        """Test that a write racing a slow invalidation is not acknowledged before it ends"""
+        self.replicator.replicated["hot"] = ["10.0.0.2:8000"]
+        sending = threading.Event()
+        release = threading.Event()
+
+        def slow_delete(url, params, timeout):
+            sending.set()
+            release.wait(5)
+            return mock.Mock(status_code=200)
+
+        acked = []
+
+        def write(name):
+            self.replicator.invalidate("hot")
+            acked.append(name)
+
+        with mock.patch("hot_key_replicator.requests.delete", side_effect=slow_delete):
+            first = threading.Thread(target=write, args=("first",))
+            first.start()
+            self.assertTrue(sending.wait(5))
+            second = threading.Thread(target=write, args=("second",))
+            second.start()
+            second.join(0.2)
+            # The replica may still serve the old value, so neither write is acknowledged yet
+            self.assertEqual(acked, [])
+            release.set()
+            first.join(5)
+            second.join(5)
+        self.assertEqual(sorted(acked), ["first", "second"])
+        self.assertEqual(self.replicator.invalidating, {})
+
+    def test_write_during_push_is_not_overwritten(self):
+        """Test that a push racing a write is neither advertised nor kept by replicas"""
+        pushes = []
+
+        def put(url, data, headers, timeout):
+            pushes.append(data)
+            # The key is written while its push is in flight
+            self.node.storage["hot"] = "v2"
+            self.replicator.invalidate("hot")
+            return mock.Mock(status_code=200, headers={})
+
+        with mock.patch("hot_key_replicator.requests.put", side_effect=put), \
+                mock.patch("hot_key_replicator.requests.delete", side_effect=self._delete):
+            self.replicator._push("hot")
+        self.assertIsNone(self.replicator.replicas_of("hot"))
+        self.assertEqual(len(self.deleted), 1)
+        pushed_version = json.loads(pushes[0])["version"]
+        self.assertGreater(self.deleted[0]["version"], pushed_version)
+
+if __name__ == '__main__':
+    unittest.main()
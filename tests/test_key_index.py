@@ -0,0 +1,80 @@
+import unittest
+from key_index import KeyIndex
+
+class TestKeyIndex(unittest.TestCase):
+    def setUp(self):
+        """Set up an index over 200 keys under two prefixes, with a tiny fold threshold"""
+        self.storage = {f"{p}{i:03d}": "v" for p in ("a", "b") for i in range(100)}
+        self.index = KeyIndex(self.storage, min_fold=8)
+
+    def add(self, key):
+        self.storage[key] = "v"
+        self.index.add(key)
+
+    def scan_all(self, prefix="", limit=7):
+        keys, after = [], None
+        while True:
+            page = self.index.page(prefix, after, limit)
+            keys.extend(page)
+            if len(page) < limit:
+                return keys
+            after = page[-1]
+
+    def test_pages_cover_prefix_in_order(self):
+        """Test that paging with a cursor returns every key with the prefix exactly once, sorted"""
+        self.assertEqual(self.scan_all("b"), sorted(k for k in self.storage if k.startswith("b")))
+        self.assertEqual(self.scan_all(), sorted(self.storage))
+
+    def test_new_keys_visible_before_and_after_fold(self):
+        """Test that added keys are returned whether they are still pending or folded in"""
+        self.add("a050x")
+        self.assertIn("a050x", self.index.pending)
+        self.assertIn("a050x", self.scan_all("a"))
+        for i in range(20):
+            self.add(f"c{i:02d}")
+        self.assertNotIn("a050x", self.index.pending)
+        self.assertEqual(self.scan_all(), sorted(self.storage))
+
+    def test_removed_and_dead_keys_skipped(self):
+        """Test that keys gone from storage, or rejected by alive(), are not returned"""
+        del self.storage["a001"]
+        page = self.index.page("a", None, 3, alive=lambda k: k != "a002")
+        self.assertEqual(page, ["a000", "a003", "a004"])
+
+    def test_readd_after_delete_not_duplicated(self):
+        """Test that a key removed and added again appears once"""
+        del self.storage["a010"]
+        self.add("a010")
+        for i in range(20):
+            self.add(f"c{i:02d}")
+        self.assertEqual(self.scan_all().count("a010"), 1)
+
+    def test_page_pulls_pending_keys_in_slices(self):
+        """Test that a page stays complete when dead keys use up a slice of pending keys"""
+        for i in range(5):
+            self.add(f"a{i:03d}p")
+        page = self.index.page("a", None, 4, alive=lambda k: not k.endswith("p") or k == "a004p")
+        self.assertEqual(page, ["a000", "a001", "a002", "a003"])
+        page = self.index.page("a", "a003", 4, alive=lambda k: not k.endswith("p") or k == "a004p")
+        self.assertEqual(page, ["a004", "a004p", "a005", "a006"])
+
+    def test_fold_during_page_loses_no_keys(self):
+        """Test that keys folded into the sorted list between slices are still returned"""
+        for i in range(8):
+            self.add(f"a{i:03d}p")
+        folded = []
+
+        def alive(key):
+            if not folded:
+                # Fold every pending key into the sorted list mid-page
+                for i in range(20):
+                    self.add(f"c{i:02d}")
+                folded.append(True)
+            return key.endswith("p") and key >= "a003" or key >= "a010"
+
+        page = self.index.page("a", None, 6, alive=alive)
+        self.assertNotIn("a006p", self.index.pending)
+        self.assertEqual(page, ["a003p", "a004p", "a005p", "a006p", "a007p", "a010"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import zlib
+import pytest
+from fastapi.testclient import TestClient
+import node as node_module
+from node import Node, app
+
+@pytest.fixture
+def api():
+    # A single-node ring, so this node owns every key
+    node_module.node = Node("127.0.0.1", 8000)
+    yield TestClient(app)
+    node_module.node._stop_services()
+
+@pytest.mark.parametrize("ttl", ["NaN", "Infinity", "-1", "0"])
+def test_put_rejects_bad_ttl(api, ttl):
+    body = '{"key": "k", "value": "v", "ttl": %s}' % ttl
+    resp = api.put("/kv", content=body, headers={"Content-Type": "application/json"})
+    assert resp.status_code in (400, 422)
+    assert "k" not in node_module.node.storage
+
+def _scan(api, **params):
+    resp = api.get("/scan", params=params)
+    assert resp.status_code == 200
+    records = [json.loads(line) for line in resp.text.splitlines() if line]
+    return [r["key"] for r in records if "key" in r], records[-1]["cursor"]
+
+def test_scan_paginates_with_prefix(api):
+    for i in range(25):
+        api.put("/kv", json={"key": f"user:{i:02d}", "value": "v"})
+        api.put("/kv", json={"key": f"order:{i:02d}", "value": "v"})
+    keys, cursor = [], None
+    while True:
+        params = {"prefix": "user:", "limit": 10}
+        if cursor:
+            params["cursor"] = cursor
+        page, cursor = _scan(api, **params)
+        keys.extend(page)
+        if cursor is None:
+            break
+    assert keys == [f"user:{i:02d}" for i in range(25)]
+
+def test_scan_rejects_bad_cursor(api):
+    assert api.get("/scan", params={"cursor": "!!!"}).status_code == 400
+
+def test_watch_returns_at_once_when_ring_is_newer(api):
+    version = node_module.node.routing_table.version
+    resp = api.get("/routing_table/watch", params={"since": version - 1, "timeout": 5})
+    assert resp.json()["version"] == version
+
+def test_watch_times_out_with_unchanged_ring(api):
+    version = node_module.node.routing_table.version
+    resp = api.get("/routing_table/watch", params={"since": version, "timeout": 0.2})
+    assert resp.json()["version"] == version
+
+def test_watch_wakes_on_ring_change(api):
+    version = node_module.node.routing_table.version
+    timer = threading.Timer(0.2, node_module.node.routing_table.add_node, ("127.0.0.1", 8001))
+    timer.start()
+    started = time.monotonic()
+    resp = api.get("/routing_table/watch", params={"since": version, "timeout": 10})
+    timer.join()
+    assert resp.json()["version"] == version + 1
+    assert time.monotonic() - started < 5
+
+def test_compressed_body_past_the_cap_is_refused(api, monkeypatch):
+    monkeypatch.setattr(node_module, "MAX_DECOMPRESSED_SIZE", 1000)
+    body = zlib.compress(json.dumps({"key": "k", "value": "x" * 5000}).encode())
+    resp = api.put("/kv", content=body, headers={"Content-Type": "application/json", "Content-Encoding": "deflate"})
+    assert resp.status_code == 413
+    assert "k" not in node_module.node.storage
+
+def test_corrupt_compressed_body_is_bad_request(api):
+    resp = api.put("/kv", content=b"garbage", headers={"Content-Type": "application/json", "Content-Encoding": "deflate"})
+    assert resp.status_code == 400
+    resp = api.put("/kv/stream", params={"key": "k"}, content=b"garbage", headers={"Content-Encoding": "deflate"})
+    assert resp.status_code == 400
+
+def test_stream_honours_refused_coding(api):
+    value = b"0123456789" * 10000
+    assert api.put("/kv/stream", params={"key": "blob"}, content=value).status_code == 200
+    resp = api.get("/kv/stream", params={"key": "blob"}, headers={"Accept-Encoding": "deflate;q=0"})
+    assert "Content-Encoding" not in resp.headers
+    assert resp.content == value
+
+def test_stream_upload_is_chunked_and_round_trips_binary(api):
+    value = os.urandom(200_000) + b"\x00" * 200_000
+    chunks = (value[i:i + 65536] for i in range(0, len(value), 65536))
+    resp = api.put("/kv/stream", params={"key": "blob"}, content=chunks)
+    assert resp.status_code == 200
+    assert resp.json()["size"] == len(value)
+    assert api.get("/kv/stream", params={"key": "blob"}).content == value
+
+def test_get_kv_on_binary_value_is_not_acceptable(api):
+    api.put("/kv/stream", params={"key": "blob"}, content=b"\xff\xfe\x00binary")
+    assert api.get("/kv", params={"key": "blob"}).status_code == 406
+
+def test_stream_upload_rejected_before_body_is_read(api):
+    node = node_module.node
+    node.routing_table.add_node("127.0.0.1", 8001)
+    key = next(f"k{i}" for i in range(1000) if not node.is_responsible(f"k{i}"))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "PUT",
+        "scheme": "http", "path": "/kv/stream", "raw_path": b"/kv/stream", "root_path": "",
+        "query_string": f"key={key}".encode(), "headers": [(b"transfer-encoding", b"chunked")],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+    }
+    body_reads, sent = [], []
+
+    async def receive():
+        body_reads.append(1)
+        return {"type": "http.request", "body": b"x" * 65536, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    assert sent[0]["status"] == 403
+    assert body_reads == []
+    assert key not in node.storage
+
+def test_batch_put_stores_owned_keys_and_returns_the_rest(api):
+    node = node_module.node
+    node.routing_table.add_node("127.0.0.1", 8001)
+    items = [{"key": f"k{i}", "value": f"v{i}"} for i in range(40)]
+    items[0]["ttl"] = 60
+    resp = api.put("/kv/batch", json={"items": items})
+    assert resp.status_code == 200
+    result = resp.json()
+    owned = [item["key"] for item in items if node.is_responsible(item["key"])]
+    assert 0 < len(owned) < len(items)
+    assert result["stored"] == len(owned)
+    assert sorted(result["rejected"]) == sorted(set(i["key"] for i in items) - set(owned))
+    assert sorted(node.storage) == sorted(owned)
@@ -67,6 +67,58 @@ class TestRoutingTable(unittest.TestCase):
         self.assertIsNotNone(responsible_node)
         self.assertIn(responsible_node.node_id, self.rt.node_map)
 
+    def test_get_successor_nodes(self):
+        """Test finding distinct nodes after a key's owner on the ring"""
+        self.rt.add_node("127.0.0.1", 8001)
+        self.rt.add_node("127.0.0.1", 8002)
+
+        owner = self.rt.get_responsible_node("test_key")
+        successors = self.rt.get_successor_nodes("test_key", 2)
+        ids = [n.node_id for n in successors]
+
+        # Check that successors are distinct and never include the owner
+        self.assertEqual(len(ids), 2)
+        self.assertEqual(len(set(ids)), 2)
+        self.assertNotIn(owner.node_id, ids)
+
+        # Asking for more nodes than exist returns every other node
+        self.assertEqual(len(self.rt.get_successor_nodes("test_key", 10)), 2)
+
+    def test_partition(self):
+        """Test grouping a batch of keys by responsible node"""
+        self.rt.add_node("127.0.0.1", 8001)
+        self.rt.add_node("127.0.0.1", 8002)
+
+        keys = [f"key{i}" for i in range(200)]
+        groups = self.rt.partition(keys)
+
+        # Every key lands in exactly one group, owned by its responsible node
+        self.assertEqual(sorted(i for idxs in groups.values() for i in idxs), list(range(200)))
+        for node_id, idxs in groups.items():
+            for i in idxs:
+                self.assertEqual(self.rt.get_responsible_node(keys[i]).node_id, node_id)
+
+    def test_without_node(self):
+        """Test planning a ring with one node taken out"""
+        self.rt.add_node("127.0.0.1", 8001)
+        self.rt.add_node("127.0.0.1", 8002)
+        version = self.rt.version
+
+        planned = self.rt.without_node("127.0.0.1:8001")
+
+        # The original ring is untouched
+        self.assertEqual(self.rt.version, version)
+        self.assertEqual(len(self.rt.node_map), 3)
+        self.assertEqual(len(self.rt.virtual_nodes), 3 * VIRTUAL_NODE_REPLICAS)
+
+        # Keys owned by the removed node move; all others keep their owner
+        self.assertNotIn("127.0.0.1:8001", planned.node_map)
+        self.assertEqual(len(planned.virtual_nodes), 2 * VIRTUAL_NODE_REPLICAS)
+        for i in range(100):
+            owner = self.rt.get_responsible_node(f"key{i}").node_id
+            if owner != "127.0.0.1:8001":
+                self.assertEqual(planned.get_responsible_node(f"key{i}").node_id, owner)
+
     def test_serialize(self):
         """Test serialization of routing table"""
         serialized = self.rt.serialize()
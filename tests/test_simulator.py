@@ -0,0 +1,87 @@
+import unittest
+from membership import LeaveError
+from simulator import Simulator
+
+class TestSimulator(unittest.TestCase):
+    def setUp(self):
+        """Set up a small converged cluster"""
+        self.sim = Simulator(nodes=12, keys=600, vnodes=10, seed=3)
+        self.sim.run(10)
+
+    def test_join_moves_only_reassigned_keys(self):
+        """Test that a join converges and moves exactly the keys the new node takes over"""
+        report = self.sim.join()
+        self.assertTrue(report["converged"])
+        self.assertEqual(report["nodes"], 13)
+        self.assertGreater(report["keys_moved"], 0)
+        self.assertEqual(report["keys_moved"], report["keys_reassigned"])
+        self.assertEqual(report["misplaced"], 0)
+        self.assertEqual(report["lost"], 0)
+
+    def test_graceful_leave_loses_nothing(self):
+        """Test that a leave hands every key to its new owner"""
+        report = self.sim.leave()
+        self.assertEqual(report["event"], "leave")
+        self.assertTrue(report["converged"])
+        self.assertEqual(report["nodes"], 11)
+        self.assertEqual(report["keys_moved"], report["keys_reassigned"])
+        self.assertEqual(report["misplaced"], 0)
+        self.assertEqual(report["lost"], 0)
+
+    def test_aborted_leave_withdraws_handed_off_copies(self):
+        """Test that an aborted leave leaves no stale copies to migrate back over newer writes"""
+        leaver = self.sim.nodes[self.sim.members[0]]
+        future = leaver.routing_table.without_node(leaver.node_id)
+        groups = future.partition(list(leaver.storage))
+        cut_off, reached = list(groups)[:2]
+        self.sim.network.partition([[cut_off], [m for m in self.sim.members if m != cut_off]])
+        with self.assertRaises(LeaveError):
+            leaver.leave()
+        self.sim.network.heal()
+        self.assertFalse(leaver.left)
+
+        key = list(leaver.storage)[groups[reached][0]]
+        self.assertNotIn(key, self.sim.nodes[reached].storage)
+        leaver.storage[key] = "FRESH"
+        self.sim.join()
+        holders = [n for n in self.sim.nodes.values() if n.running and key in n.storage]
+        self.assertEqual([n.storage[key] for n in holders], ["FRESH"])
+
+    def test_failed_late_pass_is_reported_and_retried(self):
+        """Test that keys written during the drain are kept and reported until handed off"""
+        leaver = self.sim.nodes[self.sim.members[0]]
+        key = next(iter(leaver.storage))
+        owner = leaver.routing_table.without_node(leaver.node_id).get_responsible_node(key).node_id
+        drain = leaver.migrator.handoff
+        calls = []
+
+        def handoff(ring, keys=None):
+            result = drain(ring, keys)
+            calls.append(keys)
+            if len(calls) == 1:
+                # A write lands after the drain, then the key's new owner becomes unreachable
+                leaver.storage[key] = "FRESH"
+                leaver.dirty_keys.add(key)
+                self.sim.network.partition([[owner], [m for m in self.sim.members if m != owner]])
+            return result
+
+        leaver.migrator.handoff = handoff
+        with self.assertRaises(LeaveError) as ctx:
+            leaver.leave()
+        self.assertEqual(ctx.exception.status_code, 500)
+        self.assertTrue(leaver.left)
+        self.assertEqual(leaver.storage[key], "FRESH")
+
+        self.sim.network.heal()
+        self.assertEqual(leaver.leave()["status"], "ok")
+        self.assertEqual(self.sim.nodes[owner].storage[key], "FRESH")
+        self.assertEqual(leaver.storage, {})
+
+    def test_same_seed_same_run(self):
+        """Test that runs are deterministic for a seed"""
+        other = Simulator(nodes=12, keys=600, vnodes=10, seed=3)
+        other.run(10)
+        self.assertEqual(self.sim.join(), other.join())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,17 @@
+import unittest
+from utils import encode_cursor, decode_cursor
+
+class TestCursor(unittest.TestCase):
+    def test_round_trip(self):
+        """Test that any key survives encoding as a scan cursor"""
+        for key in ["", "plain", "with/slash+plus", "ünïcode key"]:
+            self.assertEqual(decode_cursor(encode_cursor(key)), key)
+
+    def test_garbage_rejected(self):
+        """Test that malformed cursors raise instead of decoding to a different key"""
+        for cursor in ["!!!", "abc", "a+b/", encode_cursor("k") + "*"]:
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+if __name__ == "__main__":
+    unittest.main()
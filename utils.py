@@ -1,3 +1,5 @@
+import base64
+import binascii
 import hashlib
 
 def hash_str(s):
@@ -9,3 +11,13 @@ def get_host_port(node_id: str) -> tuple[str, int]:
         return host, int(port)
     except Exception as e:
         raise Exception(f"Invalid node ID: {node_id}") from e
+
+def encode_cursor(key: str) -> str:
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        # validate=True: anything outside the urlsafe alphabet is an error, not silently dropped
+        return base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError(f"Invalid scan cursor: {cursor}") from e